@@ -0,0 +1,147 @@
+"""
+Benchmarks for the game loop and for training throughput.
+
+Run through `python flappy_bird.py --bench`. Every measurement is written to a
+JSON file so the numbers of two commits can be compared.
+"""
+import copy
+import json
+import platform
+import random
+import subprocess
+import time
+
+import numpy as np
+import neat
+
+import batchnet
+import engine
+import parallel
+
+
+def rate(fn, min_time=0.25):
+    """ Calls fn until min_time seconds have passed and returns the calls per second. """
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _sized(config, size):
+    config = copy.copy(config)
+    config.pop_size = size
+    return config
+
+
+def bench_bird_move(size):
+    birds = [engine.Bird(230, 350) for _ in range(size)]
+    flock = engine.Flock(size, 230, 350)
+    jumps = np.ones(size, dtype=bool)
+
+    def step_birds():
+        for bird in birds:
+            bird.move()
+            if bird.tick_count > 10:
+                bird.jump()
+
+    def step_flock():
+        flock.move()
+        flock.jump(jumps & (flock.tick_count > 10))
+
+    return {'bird_move_fps': rate(step_birds), 'flock_move_fps': rate(step_flock)}
+
+
+def bench_collide(size):
+    # birds spread around the edges of the gap, so the pixel test can't be skipped
+    pipe = engine.Pipe(230, 300)
+    ys = np.linspace(pipe.height - 40, pipe.bottom, size)
+    birds = [engine.Bird(230, y) for y in ys]
+    flock = engine.Flock(size, 230, 350)
+    flock.y[:] = ys
+
+    return {'pipe_collide_fps': rate(lambda: [pipe.collide(bird) for bird in birds]),
+            'collide_flock_fps': rate(lambda: pipe.collide_flock(flock))}
+
+
+def bench_activate(genomes, config):
+    inputs = np.random.default_rng(0).uniform(0, 700, (len(genomes), 4))
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    batch = batchnet.BatchNetwork.create(genomes, config)
+
+    def activate_each():
+        for net, x in zip(nets, inputs):
+            net.activate(x)
+
+    return {'neat_activations_per_sec': rate(activate_each) * len(genomes),
+            'batch_activations_per_sec': rate(lambda: batch.activate(inputs)) * len(genomes)}
+
+
+def bench_simulate(genomes, config, simulate, frames):
+    info = {}
+    start = time.perf_counter()
+    simulate(genomes, config, 0, max_frames=frames, info=info)
+    elapsed = time.perf_counter() - start
+    return {'simulate_fps': info['frames'] / elapsed, 'simulate_frames': info['frames']}
+
+
+def bench_generations(config, simulate, size, generations, frames):
+    population = neat.Population(_sized(config, size))
+
+    def evaluate(genomes, config):
+        fitness = simulate([g for _, g in genomes], config, 0, max_frames=frames)
+        for (_, g), f in zip(genomes, fitness):
+            parallel.assign_fitness(g, f, config)
+
+    start = time.perf_counter()
+    population.run(evaluate, generations)
+    return {'generations_per_min': 60 * generations / (time.perf_counter() - start)}
+
+
+def run(config, simulate, player, sizes=(10, 100, 1000), frames=500, generations=3, output="bench.json"):
+    """
+    Measures every benchmark at each population size and writes the results to output.
+    player is a genome that keeps flying, copies of it give the full game step a
+    steady population to work on.
+    """
+    random.seed(0)
+    results = []
+    for size in sizes:
+        print("Benchmarking a population of {0}".format(size))
+        players = [player] * size
+        random_genomes = list(neat.Population(_sized(config, size)).population.values())[:size]
+
+        row = {'population': size}
+        row.update(bench_bird_move(size))
+        row.update(bench_collide(size))
+        row.update(bench_activate(random_genomes, config))
+        row.update(bench_simulate(players, config, simulate, frames))
+        row.update(bench_generations(config, simulate, size, generations, frames))
+        results.append(row)
+        for name, value in sorted(row.items()):
+            print("  {0:28s} {1:14.1f}".format(name, value))
+
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'frames': frames,
+        'generations': generations,
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Wrote {0}".format(output))
+    return report
+
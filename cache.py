@@ -0,0 +1,77 @@
+"""
+Fitness cache for genomes that have already played a course.
+
+A genome's fitness only depends on its network and on the course it plays,
+so an elite carried over unchanged, or an offspring identical to another
+genome, can reuse the fitness found before instead of being simulated again.
+Only games played to their end are kept: not the ones the fitness threshold
+stopped early, nor the ones that timed out. Across generations this only pays
+off when every generation plays the same course.
+"""
+import hashlib
+from collections import OrderedDict
+
+from neat.reporting import BaseReporter
+
+
+def genome_hash(genome):
+    """ Canonical digest of everything in a genome that affects its network. """
+    nodes = sorted((k, n.bias, n.response, n.activation, n.aggregation) for k, n in genome.nodes.items())
+    connections = sorted((k, c.weight) for k, c in genome.connections.items() if c.enabled)
+    return hashlib.blake2b(repr((nodes, connections)).encode(), digest_size=16).digest()
+
+
+class FitnessCache(BaseReporter):
+    """
+    Bounded LRU cache of fitness values keyed by genome structure and course seed.
+    evaluate() wraps an evaluator with the evaluate(genomes, config) interface and
+    only passes on the genomes it has not seen on the current course. As a
+    reporter it prints the hits and misses of every generation.
+    """
+
+    def __init__(self, evaluator, seeds, max_size=10000):
+        self.evaluator = evaluator
+        self.seeds = seeds
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def evaluate(self, genomes, config):
+        seed = self.seeds.current
+        pending = {}
+        for genome_id, g in genomes:
+            key = (genome_hash(g), seed)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                g.fitness, g.course_fitness = self.entries[key]
+                self.hits += 1
+            else:
+                # identical genomes in the same generation are only played once
+                pending.setdefault(key, []).append((genome_id, g))
+
+        self.misses += len(pending)
+        self.hits += sum(len(same) - 1 for same in pending.values())
+        if pending:
+            self.evaluator.evaluate([same[0] for same in pending.values()], config)
+
+        # a bird over the threshold stops the game of its whole shard, which
+        # isn't known here, so nothing of such a generation is kept
+        threshold = config.fitness_threshold
+        stopped = any(max(same[0][1].course_fitness) > threshold for same in pending.values())
+        timed_out = self.evaluator.timed_out
+        for key, same in pending.items():
+            first_id, first = same[0]
+            for _, g in same[1:]:
+                g.fitness, g.course_fitness = first.fitness, first.course_fitness
+            if not stopped and first_id not in timed_out:
+                self.entries[key] = (first.fitness, first.course_fitness)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def start_generation(self, generation):
+        self.hits = 0
+        self.misses = 0
+
+    def post_evaluate(self, config, population, species, best_genome):
+        print("Fitness cache: {0} hits, {1} misses, {2} entries".format(self.hits, self.misses, len(self.entries)))
@@ -0,0 +1,251 @@
+"""
+Checkpoints of a training run, written as compressed numpy archives.
+
+Unlike neat.Checkpointer nothing is pickled. The genomes of the population
+and of the statistics are flattened into a few typed arrays, and the
+species, statistics and RNG state go into a small JSON header. A checkpoint
+is written to a temporary file and then renamed, so a crash never leaves a
+half written one behind.
+"""
+import json
+import os
+import random
+import tempfile
+import time
+from itertools import count
+
+import numpy as np
+import neat
+from neat.reporting import BaseReporter
+
+FORMAT_VERSION = 1
+
+
+def encode_genomes(genomes):
+    """ Flattens a list of genomes into a dict of arrays. """
+    activations = sorted(set(n.activation for g in genomes for n in g.nodes.values()))
+    aggregations = sorted(set(n.aggregation for g in genomes for n in g.nodes.values()))
+    nodes = [n for g in genomes for n in g.nodes.values()]
+    connections = [c for g in genomes for c in g.connections.values()]
+    fitness = [np.nan if g.fitness is None else g.fitness for g in genomes]
+
+    return {
+        'genome_key': np.array([g.key for g in genomes], dtype=np.int64),
+        'genome_fitness': np.array(fitness, dtype=np.float64),
+        'node_count': np.array([len(g.nodes) for g in genomes], dtype=np.int32),
+        'node_key': np.array([n.key for n in nodes], dtype=np.int64),
+        'node_bias': np.array([n.bias for n in nodes], dtype=np.float64),
+        'node_response': np.array([n.response for n in nodes], dtype=np.float64),
+        'node_activation': np.array([activations.index(n.activation) for n in nodes], dtype=np.uint8),
+        'node_aggregation': np.array([aggregations.index(n.aggregation) for n in nodes], dtype=np.uint8),
+        'activation_names': np.array(activations, dtype=str),
+        'aggregation_names': np.array(aggregations, dtype=str),
+        'conn_count': np.array([len(g.connections) for g in genomes], dtype=np.int32),
+        'conn_in': np.array([c.key[0] for c in connections], dtype=np.int64),
+        'conn_out': np.array([c.key[1] for c in connections], dtype=np.int64),
+        'conn_weight': np.array([c.weight for c in connections], dtype=np.float64),
+        'conn_enabled': np.array([c.enabled for c in connections], dtype=bool),
+    }
+
+
+def decode_genomes(arrays, config):
+    """ Rebuilds the genomes stored by encode_genomes. """
+    genome_config = config.genome_config
+    activations = [str(a) for a in arrays['activation_names']]
+    aggregations = [str(a) for a in arrays['aggregation_names']]
+    node_ends = np.cumsum(arrays['node_count'])
+    conn_ends = np.cumsum(arrays['conn_count'])
+
+    genomes = []
+    for i, key in enumerate(arrays['genome_key']):
+        genome = config.genome_type(int(key))
+        fitness = arrays['genome_fitness'][i]
+        genome.fitness = None if np.isnan(fitness) else float(fitness)
+
+        for j in range(node_ends[i] - arrays['node_count'][i], node_ends[i]):
+            node = genome_config.node_gene_type(int(arrays['node_key'][j]))
+            node.bias = float(arrays['node_bias'][j])
+            node.response = float(arrays['node_response'][j])
+            node.activation = activations[arrays['node_activation'][j]]
+            node.aggregation = aggregations[arrays['node_aggregation'][j]]
+            genome.nodes[node.key] = node
+
+        for j in range(conn_ends[i] - arrays['conn_count'][i], conn_ends[i]):
+            conn = genome_config.connection_gene_type((int(arrays['conn_in'][j]), int(arrays['conn_out'][j])))
+            conn.weight = float(arrays['conn_weight'][j])
+            conn.enabled = bool(arrays['conn_enabled'][j])
+            genome.connections[conn.key] = conn
+
+        genomes.append(genome)
+    return genomes
+
+
+def _peek(indexer):
+    """ The next number of an itertools.count, which is replaced by an equal count. """
+    value = next(indexer)
+    return value, count(value)
+
+
+def save_checkpoint(filename, population, stats=None, run_seed=None):
+    """ Writes the state of a neat.Population (and its StatisticsReporter) to filename. """
+    # genomes are stored by position: the population first, then the best
+    # genome and the most fit genome of every generation, which can share a
+    # key with a later genome of different contents
+    stored = list(population.population.values())
+    best_genome = None
+    if population.best_genome is not None:
+        best_genome = len(stored)
+        stored.append(population.best_genome)
+    most_fit = []
+    if stats is not None:
+        most_fit = list(range(len(stored), len(stored) + len(stats.most_fit_genomes)))
+        stored += stats.most_fit_genomes
+
+    species = []
+    for s in population.species.species.values():
+        species.append({
+            'key': s.key,
+            'created': s.created,
+            'last_improved': s.last_improved,
+            'representative': s.representative.key,
+            # in insertion order, which decides how the next generation is bred
+            'members': list(s.members),
+            'fitness': s.fitness,
+            'adjusted_fitness': s.adjusted_fitness,
+            'fitness_history': s.fitness_history,
+        })
+
+    # the species and node counters run past extinct species and genomes, so
+    # they're stored rather than derived from what is still alive
+    next_species, population.species.indexer = _peek(population.species.indexer)
+    genome_config = population.config.genome_config
+    next_node = None
+    if genome_config.node_indexer is not None:
+        next_node, genome_config.node_indexer = _peek(genome_config.node_indexer)
+
+    header = {
+        'version': FORMAT_VERSION,
+        'generation': population.generation,
+        'population_size': len(population.population),
+        'best_genome': best_genome,
+        'most_fit_genomes': most_fit,
+        'generation_statistics': [] if stats is None else [
+            dict((str(sid), dict((str(gid), f) for gid, f in members.items())) for sid, members in gen.items())
+            for gen in stats.generation_statistics],
+        'species': species,
+        'next_species': next_species,
+        'next_node': next_node,
+        'ancestors': [[k, list(v)] for k, v in population.reproduction.ancestors.items()],
+        'run_seed': run_seed,
+        'random_state': random.getstate(),
+    }
+    arrays = encode_genomes(stored)
+    arrays['header'] = np.array(json.dumps(header))
+
+    # write next to the target and rename, so readers only ever see whole files
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def restore_checkpoint(filename, config, stats=None):
+    """
+    Loads a checkpoint into a new neat.Population, which carries on with the next generation.
+    Fills stats, if given, with the saved statistics. Returns (population, run_seed).
+    """
+    with np.load(filename, allow_pickle=False) as data:
+        arrays = dict((k, data[k]) for k in data.files)
+    header = json.loads(str(arrays.pop('header')))
+    if header['version'] != FORMAT_VERSION:
+        raise ValueError("{0} has checkpoint format {1}, expected {2}".format(
+            filename, header['version'], FORMAT_VERSION))
+
+    stored = decode_genomes(arrays, config)
+    members = stored[:header['population_size']]
+    population = dict((g.key, g) for g in members)
+
+    species_set = config.species_set_type(config.species_set_config, neat.reporting.ReporterSet())
+    for info in header['species']:
+        s = neat.species.Species(info['key'], info['created'])
+        s.last_improved = info['last_improved']
+        s.update(population[info['representative']], dict((k, population[k]) for k in info['members']))
+        s.fitness = info['fitness']
+        s.adjusted_fitness = info['adjusted_fitness']
+        s.fitness_history = info['fitness_history']
+        species_set.species[s.key] = s
+        for k in info['members']:
+            species_set.genome_to_species[k] = s.key
+    # checkpoints from before next_species was stored fall back to the highest live species
+    species_set.indexer = count(header.get('next_species', max(species_set.species, default=0) + 1))
+
+    p = neat.Population(config, (population, species_set, header['generation'] + 1))
+    species_set.reporters = p.reporters
+    if header['best_genome'] is not None:
+        p.best_genome = stored[header['best_genome']]
+
+    # carry on numbering genomes and nodes where the run left off
+    p.reproduction.ancestors = dict((k, tuple(v)) for k, v in header['ancestors'])
+    p.reproduction.genome_indexer = count(max(population) + 1)
+    next_node = header.get('next_node')
+    if next_node is None:
+        next_node = max(n for g in members for n in g.nodes) + 1
+    config.genome_config.node_indexer = count(next_node)
+
+    if stats is not None:
+        stats.most_fit_genomes = [stored[i] for i in header['most_fit_genomes']]
+        stats.generation_statistics = [
+            dict((int(sid), dict((int(gid), f) for gid, f in members.items())) for sid, members in gen.items())
+            for gen in header['generation_statistics']]
+
+    state = header['random_state']
+    random.setstate((state[0], tuple(state[1]), state[2]))
+    return p, header['run_seed']
+
+
+class Checkpointer(BaseReporter):
+    """
+    Saves a checkpoint every generation_interval generations or time_interval_seconds seconds,
+    whichever comes first. Either interval can be None to disable it.
+    """
+
+    def __init__(self, population, generation_interval=100, time_interval_seconds=300,
+                 filename_prefix='checkpoint-', stats=None, run_seed=None):
+        self.population = population
+        self.generation_interval = generation_interval
+        self.time_interval_seconds = time_interval_seconds
+        self.filename_prefix = filename_prefix
+        self.stats = stats
+        self.run_seed = run_seed
+
+        self.current_generation = None
+        self.last_generation_checkpoint = population.generation - 1
+        self.last_time_checkpoint = time.time()
+
+    def start_generation(self, generation):
+        self.current_generation = generation
+
+    def end_generation(self, config, population, species_set):
+        checkpoint_due = False
+
+        if self.time_interval_seconds is not None:
+            dt = time.time() - self.last_time_checkpoint
+            if dt >= self.time_interval_seconds:
+                checkpoint_due = True
+
+        if (checkpoint_due is False) and (self.generation_interval is not None):
+            dg = self.current_generation - self.last_generation_checkpoint
+            if dg >= self.generation_interval:
+                checkpoint_due = True
+
+        if checkpoint_due:
+            filename = '{0}{1}.npz'.format(self.filename_prefix, self.current_generation)
+            print("Saving checkpoint to {0}".format(filename))
+            save_checkpoint(filename, self.population, self.stats, self.run_seed)
+            self.last_generation_checkpoint = self.current_generation
+            self.last_time_checkpoint = time.time()
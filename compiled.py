@@ -0,0 +1,126 @@
+"""
+Compiled network files for playing a trained model.
+
+export() flattens the network of a genome into its evaluation order and
+writes it to a small binary file. CompiledNetwork.load() memory maps that file
+and evaluates it without neat or pickle, so loading a model is fast and can't
+run arbitrary code.
+
+Layout, little endian: a header of magic, format version, inputs, outputs,
+evaluated nodes, links and slots, then the arrays below, each starting on an
+8 byte boundary. Slots are numbered inputs first, then outputs, then hidden
+nodes, and node i reads the links link_start[i]:link_start[i+1].
+"""
+import mmap
+import struct
+
+import numpy as np
+
+from batchnet import ACTIVATIONS
+
+MAGIC = b'FBNN'
+FORMAT_VERSION = 1
+#codes stored in node_activation, only ever append to keep old files readable
+ACTIVATION_CODES = ('sigmoid', 'tanh', 'sin', 'gauss', 'relu', 'identity', 'clamped',
+                    'abs', 'square', 'cube', 'exp', 'hat')
+HEADER = struct.Struct('<4sIIIIII')
+ARRAYS = [
+    ('node_slot', np.int32, 'nodes'),
+    ('node_activation', np.int32, 'nodes'),
+    ('link_start', np.int32, 'nodes+1'),
+    ('link_source', np.int32, 'links'),
+    ('node_bias', np.float64, 'nodes'),
+    ('node_response', np.float64, 'nodes'),
+    ('link_weight', np.float64, 'links'),
+]
+
+
+def _lengths(nodes, links):
+    return {'nodes': nodes, 'nodes+1': nodes + 1, 'links': links}
+
+
+def export(genome, config, filename):
+    """ Compiles the network of genome, the way neat.nn.FeedForwardNetwork builds it, into filename. """
+    from neat.graphs import feed_forward_layers
+
+    input_keys = config.genome_config.input_keys
+    output_keys = config.genome_config.output_keys
+    connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+    layers = feed_forward_layers(input_keys, output_keys, connections)
+
+    slot = dict((key, i) for i, key in enumerate(list(input_keys) + list(output_keys)))
+    order = [node for layer in layers for node in sorted(layer)]
+    for node in order:
+        slot.setdefault(node, len(slot))
+
+    arrays = dict((name, []) for name, _, _ in ARRAYS)
+    arrays['link_start'].append(0)
+    for node in order:
+        ng = genome.nodes[node]
+        if ng.aggregation != 'sum' or ng.activation not in ACTIVATIONS:
+            raise ValueError("Node {0} uses {1}/{2}, which can't be compiled".format(
+                node, ng.aggregation, ng.activation))
+        arrays['node_slot'].append(slot[node])
+        arrays['node_activation'].append(ACTIVATION_CODES.index(ng.activation))
+        arrays['node_bias'].append(ng.bias)
+        arrays['node_response'].append(ng.response)
+        for inode, onode in connections:
+            if onode == node:
+                arrays['link_source'].append(slot[inode])
+                arrays['link_weight'].append(genome.connections[(inode, onode)].weight)
+        arrays['link_start'].append(len(arrays['link_source']))
+
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(input_keys), len(output_keys),
+                            len(order), len(arrays['link_source']), len(slot)))
+        for name, dtype, _ in ARRAYS:
+            f.write(b'\0' * (-f.tell() % 8))
+            f.write(np.asarray(arrays[name], dtype=np.dtype(dtype).newbyteorder('<')).tobytes())
+
+
+class CompiledNetwork:
+    """ A network loaded from an exported file, with the same outputs as its neat FeedForwardNetwork. """
+
+    def __init__(self, num_inputs, num_outputs, num_slots, arrays):
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        self.num_slots = num_slots
+        for name, _, _ in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.activation_functions = [ACTIVATIONS[ACTIVATION_CODES[code]] for code in self.node_activation]
+
+    @staticmethod
+    def load(filename):
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_inputs, num_outputs, nodes, links, slots = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("{0} is not a compiled network".format(filename))
+        if version != FORMAT_VERSION:
+            raise ValueError("{0} has format version {1}, expected {2}".format(filename, version, FORMAT_VERSION))
+
+        arrays = {}
+        offset = HEADER.size
+        lengths = _lengths(nodes, links)
+        for name, dtype, length in ARRAYS:
+            dtype = np.dtype(dtype).newbyteorder('<')
+            offset += -offset % 8
+            arrays[name] = np.frombuffer(data, dtype=dtype, count=lengths[length], offset=offset)
+            offset += dtype.itemsize * lengths[length]
+        return CompiledNetwork(num_inputs, num_outputs, slots, arrays)
+
+    def activate(self, inputs):
+        if len(inputs) != self.num_inputs:
+            raise RuntimeError("Expected {0:n} inputs, got {1:n}".format(self.num_inputs, len(inputs)))
+
+        values = [0.0] * self.num_slots
+        values[:self.num_inputs] = inputs
+        link_start, link_source, link_weight = self.link_start, self.link_source, self.link_weight
+        for i, slot in enumerate(self.node_slot):
+            s = 0.0
+            for j in range(link_start[i], link_start[i + 1]):
+                s += values[link_source[j]] * link_weight[j]
+            values[slot] = float(self.activation_functions[i](self.node_bias[i] + self.node_response[i] * s))
+
+        return values[self.num_inputs:self.num_inputs + self.num_outputs]
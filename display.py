@@ -0,0 +1,425 @@
+"""
+The pygame front end: sprites, the game window and the interactive game loop.
+
+Only the play modes import this module, so training never initialises pygame
+or loads an image.
+"""
+import os
+import time
+
+import numpy as np
+import pygame
+
+import engine
+import profiling
+
+# Defining the display window, only opened by init_display
+WIN_WIDTH, WIN_HEIGHT = engine.WIN_WIDTH, engine.WIN_HEIGHT
+win = None
+
+
+# Getting and defining all surfaces (images) as constants
+BIRD_IMGS = [
+    pygame.transform.scale2x(pygame.image.load(os.path.join(engine.IMG_DIR, "bird1.png"))), 
+    pygame.transform.scale2x(pygame.image.load(os.path.join(engine.IMG_DIR, "bird2.png"))),
+    pygame.transform.scale2x(pygame.image.load(os.path.join(engine.IMG_DIR, "bird3.png")))
+]
+PIPE_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join(engine.IMG_DIR, "pipe.png")))
+PIPE_TOP_IMG = pygame.transform.flip(PIPE_IMG, False, True)
+BASE_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join(engine.IMG_DIR, "base.png")))
+BG_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join(engine.IMG_DIR, "bg.png")))
+STAT_FONT = None
+
+#steps the game advances in one second at normal speed, and the most frames drawn in one second
+FPS = 60
+
+
+def init_display():
+    """ Starts pygame and opens the game window, only needed when someone is watching. """
+    global win, STAT_FONT
+    pygame.font.init()
+    pygame.init()
+    win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+    pygame.display.set_caption("Flappy Bird")
+    STAT_FONT = pygame.font.SysFont("roboto", 50)
+    return win
+
+
+# The physics of each entity lives in engine.py, the classes here only add the
+# sprites needed to draw them and the pixel perfect pygame collision
+class Bird(engine.Bird):
+    IMGS = BIRD_IMGS
+    IMG_MASKS = dict((img, pygame.mask.from_surface(img)) for img in BIRD_IMGS)   #built once per animation frame
+    ANIMATION_TIME = 5      #time for which each animation will hold i.e. the rate at which the bird all flap its wings
+    ROTATED = {}            #rotated sprites by (image, tilt)
+
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.img_count = 0          #image currently being rendered
+        self.img = self.IMGS[0]     
+
+    def draw(self, win):
+        self.img_count += 1
+
+        #decides on which image to show based on the image_count 
+        if self.img_count < self.ANIMATION_TIME:
+            self.img = self.IMGS[0]       
+        elif self.img_count < self.ANIMATION_TIME*2:
+            self.img = self.IMGS[1]
+        elif self.img_count < self.ANIMATION_TIME*3:
+            self.img = self.IMGS[2]
+        elif self.img_count < self.ANIMATION_TIME*4:
+            self.img = self.IMGS[1]
+        elif self.img_count < self.ANIMATION_TIME*4 + 1:
+            self.img = self.IMGS[0]
+            self.img_count = 0
+
+        if self.tilt <= -80:
+            self.img = self.IMGS[1]
+            self.img_count = self.ANIMATION_TIME*2
+
+
+        #to rotate the image around its center, the bird only ever takes a few
+        #tilts so every rotation is made once and reused
+        key = (self.img, self.tilt)
+        rotated_image = self.ROTATED.get(key)
+        if rotated_image is None:
+            rotated_image = self.ROTATED[key] = pygame.transform.rotate(self.img, self.tilt)
+        new_rect = rotated_image.get_rect(center=self.img.get_rect(topleft=(self.x,self.y)).center)
+        return win.blit(rotated_image, new_rect.topleft)
+
+
+    #function handling collisions with objects
+    def get_mask(self):
+        return self.IMG_MASKS[self.img]
+
+        
+
+class Pipe(engine.Pipe):
+    __slots__ = ()
+    PIPE_TOP = PIPE_TOP_IMG
+    PIPE_BOTTOM = PIPE_IMG
+    PIPE_TOP_MASK = pygame.mask.from_surface(PIPE_TOP_IMG)
+    PIPE_BOTTOM_MASK = pygame.mask.from_surface(PIPE_IMG)
+
+    def draw(self, win):
+        return draw_pipe(win, self)
+    
+    #masks, in pygame, are used to detect pixel perfect collision
+    #masks basically monitors the position of the pixels against a transparent background
+    #each object on screen will be enclosed in a square and mask on that square will distinguish the 
+    #object pixels against the background pixels. 
+    #Overlapping of masks of two different objects will indicate the collision of the objects, rather
+    #than that of the squares. therefore, making the collision perfect in the user's prespective as well.
+
+    def collide(self, bird, pixel_perfect=True):
+        #bounding boxes rule out almost every frame before the masks are needed
+        if not self.overlaps_x(bird.x, bird.img.get_width()):
+            return False
+        if self.in_gap(round(bird.y), bird.img.get_height()):
+            return False
+        if not pixel_perfect:
+            return True
+
+        bird_mask = bird.get_mask()
+        top_mask = self.PIPE_TOP_MASK
+        bottom_mask = self.PIPE_BOTTOM_MASK
+
+        #offset of the bird from the top pipe and bottom pipe
+        top_offset = (self.x - bird.x, self.top - round(bird.y))
+        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
+
+        #finding the point of overlap between bird mask and bottom mask using the bottom_offset
+        b_point = bird_mask.overlap(bottom_mask, bottom_offset)
+        #finding the point of overlap between bird mask and top mask using the top_offset
+        t_point = bird_mask.overlap(top_mask, top_offset)
+
+        #if no overlap, overlap() returns none
+        if t_point or b_point :
+            #some collision occured
+            return True
+        #no collision occured
+        return False
+
+
+class Base(engine.Base):
+    IMG = BASE_IMG
+
+    #menthod to draw the base onto the display window
+    def draw(self, win):
+        return draw_base(win, self)
+
+
+# The pipes and the base are drawn from their positions alone, so the
+# headless engine objects of a training game can be drawn as well
+def draw_pipe(win, pipe):
+    return [win.blit(PIPE_TOP_IMG, (pipe.x, pipe.top)), win.blit(PIPE_IMG, (pipe.x, pipe.bottom))]
+
+
+def draw_base(win, base):
+    return [win.blit(BASE_IMG, (tile.x, base.y)) for tile in base.tiles]
+
+
+class Renderer:
+    """
+    Redraws the window frame after frame, touching only what changed.
+    Every sprite blitted in a frame leaves its rectangle behind, and the next
+    frame paints the background back over just those rectangles before drawing
+    the sprites again. Only the rectangles of both frames are sent to the
+    screen, and the score text is rendered once per score.
+    """
+
+    def __init__(self, win):
+        self.win = win
+        self.dirty = None           #rectangles drawn in the previous frame, None until the first one
+        self.score = None
+        self.score_text = None
+
+    def draw(self, birds, pipes, base, score):
+        win = self.win
+        if self.dirty is None:
+            win.blit(BG_IMG, (0,0))
+        else:
+            for rect in self.dirty:
+                win.blit(BG_IMG, rect, rect)
+
+        drawn = []
+        for pipe in pipes:
+            drawn += draw_pipe(win, pipe)
+
+        if score != self.score:
+            self.score = score
+            self.score_text = STAT_FONT.render("Score: " + str(score), 1, (255,255,255))
+        drawn.append(win.blit(self.score_text, (WIN_WIDTH - 10 - self.score_text.get_width(), 10)))
+
+        drawn += draw_base(win, base)
+
+        for bird in birds:
+            drawn.append(bird.draw(win))
+
+        if self.dirty is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(self.dirty + drawn)
+        self.dirty = drawn
+
+
+class Scheduler:
+    """
+    Fixed timestep pacing for the viewers. The game advances FPS steps per
+    second of real time, times speed, no matter how long drawing takes: each
+    frame runs every step that has come due and the window is drawn at most
+    render_rate times a second. skip(n) runs n steps at once without drawing.
+    Speed can be changed from the keyboard through handle_event: up or + to
+    double it, down or - to halve it, and s to skip skip_steps steps.
+    """
+    MAX_LAG = 0.25      #seconds of steps still run after a stall, older ones are dropped
+
+    def __init__(self, speed=1.0, skip_steps=600, render_rate=FPS):
+        self.speed = speed
+        self.skip_steps = skip_steps
+        self.render_rate = render_rate
+        self.due = 0.0              #steps owed to the clock, including a fraction of the next one
+        self.last = None            #time of the previous frame
+        self.skipping = 0
+
+    def skip(self, steps):
+        self.skipping += steps
+
+    def steps(self):
+        """ Waits for the next frame and returns how many steps to run before drawing it. """
+        if self.skipping:
+            steps, self.skipping = self.skipping, 0
+            self.last = None
+            return steps
+
+        now = time.perf_counter()
+        if self.last is None:
+            self.last = now
+            return 1
+
+        rate = self.speed * FPS
+        wait = max(self.last + 1 / self.render_rate - now, (1 - self.due) / rate - (now - self.last))
+        if wait > 0:
+            time.sleep(wait)
+            now = time.perf_counter()
+        self.due = min(self.due + (now - self.last) * rate, rate * self.MAX_LAG + 1)
+        self.last = now
+
+        steps = max(int(self.due), 1)
+        self.due = max(self.due - steps, 0.0)
+        return steps
+
+    def handle_event(self, event):
+        if event.type != pygame.KEYDOWN:
+            return
+        if event.key in (pygame.K_UP, pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            self.speed *= 2
+        elif event.key in (pygame.K_DOWN, pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.speed /= 2
+        elif event.key == pygame.K_s:
+            self.skip(self.skip_steps)
+            print("Skipping {0} steps".format(self.skip_steps))
+            return
+        else:
+            return
+        print("Speed x{0:g}".format(self.speed))
+
+
+class FlockView:
+    """
+    Draws a training game of the headless engine, to be passed as the render
+    argument of flappy_bird.simulate. Only the top_k live birds with the most
+    fitness get a sprite, so a large population costs no more to watch than a
+    small one. The games are paced by a Scheduler, frames are only drawn once
+    the steps it hands out have been played.
+    """
+
+    def __init__(self, top_k=10, speed=1.0, skip_steps=600, courses=1):
+        self.top_k = top_k
+        self.courses = courses      #courses played at once, only the birds of the first one are drawn
+        self.scheduler = Scheduler(speed, skip_steps)
+        self.renderer = None
+        self.sprites = []
+        self.pending = 0            #steps left to play before the next frame is drawn
+
+    def __call__(self, flock, pipes, base, score):
+        if self.renderer is None:
+            self.renderer = Renderer(win or init_display())
+            self.sprites = [Bird(flock.x, 0) for _ in range(self.top_k)]
+        self.pending -= 1
+        if self.pending > 0:
+            return
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                quit()
+            self.scheduler.handle_event(event)
+
+        live = np.flatnonzero(flock.alive[:len(flock) // self.courses])
+        top = live[np.argsort(-flock.fitness[live], kind='stable')[:self.top_k]]
+        for sprite, i in zip(self.sprites, top):
+            sprite.y = float(flock.y[i])
+            sprite.tilt = float(flock.tilt[i])
+        self.renderer.draw(self.sprites[:len(top)], pipes, base, score)
+        self.pending = self.scheduler.steps()
+
+
+def play(controller, timer=None, scheduler=None, controls=False, pixel_perfect=True):
+    """
+    Runs the game in the window with a single bird.
+    controller(bird, pipe) is called every step with the next pipe ahead and
+    returns True when the bird should jump. The steps are paced by scheduler,
+    a Scheduler at normal speed by default, which takes its keys when controls
+    is set. A profiling.PhaseTimer passed as timer gets the time of every
+    phase, printed when the game ends. Without pixel_perfect the bird crashes
+    as soon as it leaves the gap beside a pipe, see engine.Pipe.collide.
+    """
+    try:
+        _game_loop(controller, timer or profiling.NULL_TIMER, scheduler or Scheduler(), controls, pixel_perfect)
+    finally:
+        if timer is not None:
+            print("Phase times: " + timer.summary())
+
+
+def _game_loop(controller, timer, scheduler, controls, pixel_perfect):
+    renderer = Renderer(init_display())
+    base = Base(engine.FLOOR)
+    pipes = engine.Pipes(Pipe)
+    pipes.add(700)
+    bird = Bird(230,350)
+
+    score = 0
+
+    #the game loop, one frame after another
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                quit()
+            if controls:
+                scheduler.handle_event(event)
+        timer.lap('events')
+
+        # the scheduler keeps the game at its own pace, however fast the frames are drawn
+        steps = scheduler.steps()
+        timer.lap('clock')
+
+        for _ in range(steps):
+            # move bird
+            bird.move()
+            timer.lap('physics')
+            if controller(bird, pipes.next):
+                bird.jump() 
+            timer.lap('network')
+
+            add_pipe = False
+            leaving = 0
+            for pipe in pipes:
+                if pipe.collide(bird, pixel_perfect):
+                    return
+                timer.lap('collision')
+
+                if not pipe.passed and pipe.x < bird.x:
+                    pipe.passed = True
+                    add_pipe = True
+
+                if pipe.x + pipe.WIDTH < 0:
+                    leaving += 1
+            pipes.move()
+            timer.lap('pipes')
+
+            if add_pipe:
+                score += 1
+                pipes.add(700)
+
+            for _ in range(leaving):
+                pipes.drop()
+            timer.lap('pipes')
+
+            # check if bird has hit ground
+            if bird.out_of_bounds():
+                return
+
+            base.move()
+            timer.lap('pipes')
+
+        renderer.draw([bird], pipes, base, score)
+        timer.lap('render')
+
+
+def replay(episode, scheduler=None, start=0):
+    """
+    Plays an episodes.Episode back in the window from frame start, at the pace
+    of scheduler. No network is run, the bird is put where it was recorded.
+    Left and right seek back and forward by the scheduler's skip steps, and
+    the replay ends with the last frame.
+    """
+    import episodes
+
+    scheduler = scheduler or Scheduler()
+    renderer = Renderer(init_display())
+    world = episodes.World(episode)
+    world.seek(start)
+    bird = Bird(230, 350)
+    last = len(episode) - 1
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                quit()
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                step = scheduler.skip_steps if event.key == pygame.K_RIGHT else -scheduler.skip_steps
+                world.seek(world.frame + step)
+                print("Frame {0}".format(world.frame))
+            else:
+                scheduler.handle_event(event)
+
+        bird.y = episode.y[world.frame]
+        bird.tilt = episode.tilt[world.frame]
+        renderer.draw([bird], world.pipes, world.base, world.score)
+        if world.frame == last:
+            return
+        world.seek(world.frame + scheduler.steps())
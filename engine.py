@@ -0,0 +1,508 @@
+"""
+Headless simulation core for Flappy Bird.
+
+Holds the game physics for the bird, the pipes and the base without any
+dependency on pygame: no display, no clock and no surfaces. The sprites only
+contribute their collision masks, which are decoded straight from the PNG
+files into numpy arrays. The pygame front end in display.py subclasses
+these classes and adds the drawing on top.
+
+The headless bird has no flap animation, so it always collides with the mask
+of bird1.png. The window collides with the mask of the frame on screen, which
+can make a game there end a frame sooner or later than here when the bird
+only grazes a pipe.
+"""
+import functools
+import os
+import random
+import struct
+import zlib
+
+import numpy as np
+
+# dimensions of the display window, the game world lives in the same coordinates
+WIN_WIDTH, WIN_HEIGHT = 570, 800
+FLOOR = 730                 #y coordinate of the top of the base
+
+COURSE_LENGTH = 4096        #pipes in a precomputed course, longer games wrap around
+
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imgs")
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    if pb <= pc:
+        return b
+    return c
+
+
+def _read_png(path):
+    """ Decodes a non-interlaced PNG into (h, w) arrays of pixel values and alpha. """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    pos = 8
+    idat = b""
+    trns = b""
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if kind == b"IHDR":
+            width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", body)
+        elif kind == b"tRNS":
+            trns = body
+        elif kind == b"IDAT":
+            idat += body
+        pos += 12 + length
+
+    if interlace or color_type not in (3, 6) or (color_type == 6 and depth != 8):
+        raise ValueError("unsupported PNG format in {0}".format(path))
+
+    # bytes per complete pixel (at least 1) and per scanline
+    channels = 4 if color_type == 6 else 1
+    bpp = max(1, channels * depth // 8)
+    stride = (width * channels * depth + 7) // 8
+
+    raw = zlib.decompress(idat)
+    rows = []
+    prev = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        kind = raw[start]
+        line = bytearray(raw[start + 1:start + 1 + stride])
+        for i in range(stride):
+            a = line[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            if kind == 1:
+                line[i] = (line[i] + a) & 0xFF
+            elif kind == 2:
+                line[i] = (line[i] + b) & 0xFF
+            elif kind == 3:
+                line[i] = (line[i] + ((a + b) >> 1)) & 0xFF
+            elif kind == 4:
+                line[i] = (line[i] + _paeth(a, b, c)) & 0xFF
+        rows.append(bytes(line))
+        prev = line
+
+    pixels = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(height, stride)
+    if color_type == 6:
+        rgba = pixels.reshape(height, width, 4)
+        return rgba.view(">u4")[:, :, 0], rgba[:, :, 3].copy()
+
+    # palette image: unpack the indices and look their alpha up in tRNS
+    indices = np.unpackbits(pixels, axis=1).reshape(height, stride * 8 // depth, depth)
+    indices = indices.dot(1 << np.arange(depth - 1, -1, -1))[:, :width]
+    lookup = np.full(256, 255, dtype=np.uint8)
+    lookup[:len(trns)] = np.frombuffer(trns, dtype=np.uint8)
+    return indices, lookup[indices]
+
+
+def _scale2x(keys, values):
+    """ Same edge smoothing as pygame.transform.scale2x, deciding on keys and copying values. """
+    pad = np.pad(keys, 1, mode="edge")
+    b, h = pad[:-2, 1:-1], pad[2:, 1:-1]
+    d, f = pad[1:-1, :-2], pad[1:-1, 2:]
+    padv = np.pad(values, 1, mode="edge")
+    vd, vf = padv[1:-1, :-2], padv[1:-1, 2:]
+
+    out = np.empty((2 * keys.shape[0], 2 * keys.shape[1]), dtype=values.dtype)
+    out[0::2, 0::2] = np.where((b == d) & (b != f) & (d != h), vd, values)
+    out[0::2, 1::2] = np.where((b == f) & (b != d) & (f != h), vf, values)
+    out[1::2, 0::2] = np.where((d == h) & (d != b) & (h != f), vd, values)
+    out[1::2, 1::2] = np.where((h == f) & (d != h) & (b != f), vf, values)
+    return out
+
+
+def load_mask(name):
+    """ Returns the collision mask of a sprite, scaled 2x like the rendered images. """
+    pixels, alpha = _read_png(os.path.join(IMG_DIR, name))
+    return _scale2x(pixels, alpha) > 127        #same threshold pygame.mask.from_surface uses
+
+
+def overlap(mask_a, pos_a, mask_b, pos_b):
+    """ Checks two boolean masks placed at the (x, y) positions for any shared pixel. """
+    ax, ay = pos_a
+    bx, by = pos_b
+    left, right = max(ax, bx), min(ax + mask_a.shape[1], bx + mask_b.shape[1])
+    top, bottom = max(ay, by), min(ay + mask_a.shape[0], by + mask_b.shape[0])
+    if left >= right or top >= bottom:
+        return False
+    a = mask_a[top - ay:bottom - ay, left - ax:right - ax]
+    b = mask_b[top - by:bottom - by, left - bx:right - bx]
+    return bool(np.any(a & b))
+
+
+def overlap_many(mask_a, ax, ays, mask_b, pos_b):
+    """ Vectorized overlap() for copies of mask_a placed at one x and an array of y positions. """
+    bx, by = pos_b
+    hits = np.zeros(len(ays), dtype=bool)
+    left, right = max(ax, bx), min(ax + mask_a.shape[1], bx + mask_b.shape[1])
+    if left >= right or len(ays) == 0:
+        return hits
+    a = mask_a[:, left - ax:right - ax]
+    b = mask_b[:, left - bx:right - bx]
+
+    #row of mask_b lying under every row of every copy of mask_a, rows outside mask_b are empty
+    rows = ays[:, None] + np.arange(mask_a.shape[0]) - by
+    inside = (rows >= 0) & (rows < mask_b.shape[0])
+    under = b[np.clip(rows, 0, mask_b.shape[0] - 1)] & inside[:, :, None]
+    return np.any(under & a, axis=(1, 2))
+
+
+BIRD_MASK = load_mask("bird1.png")
+PIPE_BOTTOM_MASK = load_mask("pipe.png")
+PIPE_TOP_MASK = PIPE_BOTTOM_MASK[::-1]
+BASE_WIDTH = load_mask("base.png").shape[1]
+
+
+@functools.lru_cache(maxsize=None)
+def pipe_hit_rows(dx, top):
+    """
+    Precomputed collisions of the bird against one pipe half lying dx pixels to
+    its right (pipe.x - bird.x). Entry r is True when the bird collides with its
+    rounded y at r - Bird.HEIGHT + 1 rows below the y of that half.
+    """
+    half = PIPE_TOP_MASK if top else PIPE_BOTTOM_MASK
+    ys = np.arange(1 - BIRD_MASK.shape[0], half.shape[0])
+    return overlap_many(BIRD_MASK, 0, ys, half, (dx, 0))
+
+
+def pipe_hits(dx, top, offsets):
+    """ pipe_hit_rows looked up for an array of bird y offsets from the y of the pipe half. """
+    rows = pipe_hit_rows(dx, top)
+    index = offsets + BIRD_MASK.shape[0] - 1
+    inside = (index >= 0) & (index < len(rows))
+    return inside & rows[np.clip(index, 0, len(rows) - 1)]
+
+
+def course_seeds(seed, courses):
+    """ Seeds of the courses played together on seed, the first one being seed itself. """
+    return [seed] + [int(s) for s in np.random.SeedSequence(seed).generate_state(courses - 1)]
+
+
+def make_course(seed, length=COURSE_LENGTH, warmup=0):
+    """
+    Returns the heights of the pipes of a course, pipe i being the one added at score i.
+    The same seed always gives the same course. The pipes after the first one up
+    to warmup alternate between the highest and the lowest gap.
+    """
+    heights = np.random.default_rng(seed).integers(50, 450, size=length)
+    for score in range(1, min(warmup, length)):
+        heights[score] = 50 if score % 2 == 0 else 500
+    return heights
+
+
+class Bird:
+    MAX_ROTATION = 25       #range upto which the player can tilt the bird
+    ROT_VEL = 20            #rotation allowed per frame/move
+    MASK = BIRD_MASK
+    HEIGHT, WIDTH = BIRD_MASK.shape
+
+    def __init__(self, x, y):
+        #starting coordinates for the bird
+        self.x = x
+        self.y = y
+        #starting orientation of the bird
+        self.tilt = 0               #the bird looks straight towards the right
+        self.tick_count = 0         #no. of moves made since the last jump, used for the physics calc
+        self.vel = 0                #bird is stationary
+        self.height = self.y
+
+    def jump(self):
+        self.vel = -10.5            #the upper-left corner of the window is (0,0), so going up needs a negative value
+        self.tick_count = 0         #keeps track of when the last jump occured
+        self.height = self.y        #height from which the jump was made
+
+    #method to define the movement of the bird.
+    #flappy bird only moves up and down
+    def move(self):
+        self.tick_count += 1        #tracks the no. of moves made since the last jump
+
+        #formula defining the arc for the bird when it jumps
+        #displacement disp is in pixels
+        disp = self.vel + 1.8*(self.tick_count/2)
+
+        #setting a limit to the velocity when going downwards and upwards
+        if disp > 8:
+            disp = 8
+        if disp < 0:
+            disp -= 2
+
+        self.y = self.y+disp
+
+        if disp < 0 or self.y < self.height + 50:
+            if self.tilt < self.MAX_ROTATION:
+                self.tilt = self.MAX_ROTATION   #while the bird is going up, we don't want it to climb up 90 deg
+        else:
+            if self.tilt > -90:                 #but while going down, it may look like nose-diving
+                self.tilt -= self.ROT_VEL
+
+    def out_of_bounds(self):
+        """ True once the bird has hit the ground or flown over the top of the window. """
+        return self.y + self.HEIGHT > FLOOR or self.y < 0
+
+
+class Flock:
+    """
+    A whole population of birds stored as a structure of arrays.
+    Every bird shares the same x, so one array op per field advances all of
+    them with the exact same rules as Bird.
+    """
+    MAX_ROTATION = Bird.MAX_ROTATION
+    ROT_VEL = Bird.ROT_VEL
+    MASK = Bird.MASK
+    HEIGHT, WIDTH = Bird.HEIGHT, Bird.WIDTH
+
+    def __init__(self, size, x, y):
+        self.x = x
+        self.y = np.full(size, y, dtype=float)
+        self.tilt = np.zeros(size)
+        self.tick_count = np.zeros(size, dtype=int)
+        self.vel = np.zeros(size)
+        self.height = self.y.copy()
+        self.alive = np.ones(size, dtype=bool)
+        self.fitness = np.zeros(size)
+
+    def __len__(self):
+        return len(self.y)
+
+    def jump(self, mask):
+        """ Makes the birds selected by the boolean mask jump. """
+        self.vel[mask] = -10.5
+        self.tick_count[mask] = 0
+        self.height[mask] = self.y[mask]
+
+    def move(self):
+        self.tick_count += 1
+
+        disp = self.vel + 1.8*(self.tick_count/2)
+        disp = np.minimum(disp, 8)
+        disp = np.where(disp < 0, disp - 2, disp)
+
+        self.y += disp
+
+        going_up = (disp < 0) | (self.y < self.height + 50)
+        falling_tilt = np.where(self.tilt > -90, self.tilt - self.ROT_VEL, self.tilt)
+        self.tilt = np.where(going_up, np.maximum(self.tilt, self.MAX_ROTATION), falling_tilt)
+
+    def out_of_bounds(self):
+        """ Mask of the live birds that have hit the ground or flown over the top of the window. """
+        return self.alive & ((self.y + self.HEIGHT > FLOOR) | (self.y < 0))
+
+
+class Ring:
+    """
+    A fixed number of records reused in a circle, holding a queue of them
+    oldest first. push() hands out the record after the newest one, recycled
+    from those dropped before, so nothing is allocated while a game runs.
+    Every record gets a slot attribute, its fixed place in the ring, for
+    data kept next to the ring in arrays.
+    """
+
+    def __init__(self, records):
+        self.records = list(records)
+        for slot, record in enumerate(self.records):
+            record.slot = slot
+        self.first = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not -self.count <= i < self.count:
+            raise IndexError("ring index out of range")
+        return self.records[(self.first + i % self.count) % len(self.records)]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.records[(self.first + i) % len(self.records)]
+
+    def push(self):
+        """ Returns the record that becomes the newest one, to be filled in by the caller. """
+        if self.count == len(self.records):
+            raise IndexError("ring of {0} records is full".format(len(self.records)))
+        record = self.records[(self.first + self.count) % len(self.records)]
+        self.count += 1
+        return record
+
+    def popleft(self):
+        """ Drops the oldest record and returns it. """
+        if not self.count:
+            raise IndexError("pop from an empty ring")
+        record = self.records[self.first]
+        self.first = (self.first + 1) % len(self.records)
+        self.count -= 1
+        return record
+
+    def clear(self):
+        self.first = 0
+        self.count = 0
+
+
+class Pipe:
+    __slots__ = ('x', 'height', 'top', 'bottom', 'passed', 'slot')
+    GAP = 200   #pixels in between two pipes
+    VEL = 5
+    TOP_MASK = PIPE_TOP_MASK
+    BOTTOM_MASK = PIPE_BOTTOM_MASK
+    WIDTH = PIPE_BOTTOM_MASK.shape[1]
+    LENGTH = PIPE_BOTTOM_MASK.shape[0]
+
+    def __init__(self, x, height=None):
+        self.slot = None
+        self.reset(x, height)
+
+    def reset(self, x, height=None):
+        """ Puts the pipe back at x as a new one, for pipes reused by Pipes. """
+        self.x = x
+        self.passed = False     #whether the bird has passed the pipe
+        self.set_height(height)
+
+    def set_height(self, height=None):
+        if height is None:
+            height = random.randrange(50, 450)
+        self.height = height
+        self.top = self.height - self.LENGTH
+        self.bottom = self.height + self.GAP
+
+    #the pipes move only from right to left so as to make an illusion of the bird moving forward
+    def move(self):
+        self.x -= self.VEL
+
+    def in_gap(self, y, height):
+        """ True where an object spanning rows [y, y+height) stays clear of both pipe halves vertically. """
+        return (y >= self.height) & (y + height <= self.bottom)
+
+    def overlaps_x(self, x, width):
+        """ True when an object spanning columns [x, x+width) shares a column with the pipe. """
+        return x < self.x + self.WIDTH and self.x < x + width
+
+    def collide(self, bird, pixel_perfect=True):
+        """
+        Collision of the bird against both halves of the pipe. pixel_perfect
+        False swaps the pixel masks for the analytic test: any bird sharing a
+        column with the pipe and not fully inside the gap has crashed.
+        """
+        #cheap box tests rule out almost every frame before any mask is looked at
+        if not self.overlaps_x(bird.x, bird.WIDTH):
+            return False
+        bird_y = round(bird.y)
+        if self.in_gap(bird_y, bird.HEIGHT):
+            return False
+        if not pixel_perfect:
+            return True
+
+        bird_pos = (bird.x, bird_y)
+        return (overlap(bird.MASK, bird_pos, self.TOP_MASK, (self.x, self.top)) or
+                overlap(bird.MASK, bird_pos, self.BOTTOM_MASK, (self.x, self.bottom)))
+
+    def collide_flock(self, flock, heights=None, pixel_perfect=True):
+        """
+        Returns a mask of the live birds of the flock hitting this pipe, with
+        the test collide uses for pixel_perfect. heights gives every bird its
+        own gap height instead of the pipe's, for birds playing several courses
+        at once.
+        """
+        hits = np.zeros(len(flock), dtype=bool)
+        if not self.overlaps_x(flock.x, flock.WIDTH):
+            return hits
+        ys = np.round(flock.y).astype(int)
+        if heights is not None:
+            bottoms = heights + self.GAP
+            candidates = flock.alive & ~((ys >= heights) & (ys + flock.HEIGHT <= bottoms))
+            if not pixel_perfect:
+                return candidates
+            index = np.flatnonzero(candidates)
+            dx = self.x - flock.x
+            hits[index] = (pipe_hits(dx, True, ys[index] - (heights[index] - self.LENGTH)) |
+                           pipe_hits(dx, False, ys[index] - bottoms[index]))
+            return hits
+
+        candidates = flock.alive & ~self.in_gap(ys, flock.HEIGHT)
+        if not pixel_perfect:
+            return candidates
+
+        index = np.flatnonzero(candidates)
+        ys = ys[index]
+        hits[index] = (overlap_many(flock.MASK, flock.x, ys, self.TOP_MASK, (self.x, self.top)) |
+                       overlap_many(flock.MASK, flock.x, ys, self.BOTTOM_MASK, (self.x, self.bottom)))
+        return hits
+
+
+class Pipes(Ring):
+    """
+    The pipes of a game, oldest first, in a ring of reused pipe_type records.
+    A pipe is only added once the one before it is passed, so no more than
+    three are ever around. The index of the pipe ahead of the birds is kept
+    up to date as the pipes move, come and go.
+    """
+    CAPACITY = 4
+
+    def __init__(self, pipe_type=Pipe, capacity=CAPACITY):
+        #the spare records get a fixed height, a random one would use up the random state
+        super().__init__(pipe_type(0, 0) for _ in range(capacity))
+        self.ahead = 0
+
+    def _second_ahead(self):
+        #the birds look at the second pipe once half of it is on screen
+        return self.count > 1 and self[1].x + Pipe.WIDTH/2 < WIN_WIDTH
+
+    @property
+    def next(self):
+        """ The pipe the birds should look at. """
+        return self[self.ahead]
+
+    def add(self, x, height=None):
+        """ Adds a new pipe at x after the others and returns it. """
+        pipe = self.push()
+        pipe.reset(x, height)
+        self.ahead = int(self._second_ahead())
+        return pipe
+
+    def move(self):
+        for pipe in self:
+            pipe.move()
+        #the second pipe only ever moves closer, the index can only go up here
+        if not self.ahead and self._second_ahead():
+            self.ahead = 1
+
+    def drop(self):
+        """ Removes the oldest pipe, once it has left the window. """
+        self.popleft()
+        self.ahead = int(self._second_ahead())
+
+    def clear(self):
+        super().clear()
+        self.ahead = 0
+
+
+class Tile:
+    """ One tile of the base, its x position in a slot of the base's ring. """
+    __slots__ = ('x', 'slot')
+
+
+class Base:
+    VEL = 5     #same velocity as the pipes so that they seem to move at the same pace
+    WIDTH = BASE_WIDTH
+
+    def __init__(self, y):
+        self.y = y
+        #two tiles side by side, the one on the left first
+        self.tiles = Ring(Tile() for _ in range(2))
+        self.tiles.push().x = 0
+        self.tiles.push().x = self.WIDTH
+
+    def move(self):
+        for tile in self.tiles:
+            tile.x -= self.VEL
+
+        #cycling back the tiles as and when they go off window, giving an illusion of endless base
+        if self.tiles[0].x + self.WIDTH < 0:
+            x = self.tiles[-1].x + self.WIDTH
+            self.tiles.popleft()
+            self.tiles.push().x = x
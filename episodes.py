@@ -0,0 +1,226 @@
+"""
+Recordings of single bird games that can be replayed without the network.
+
+A recording keeps the course seed and, for every frame, the bird's position
+and tilt as deltas from the frame before, plus one bit for each jump and for
+each pipe passed. The pipes and the base are rebuilt from the course, so any
+frame of the game can be shown straight away. Episodes are saved as
+compressed numpy archives with a small JSON header, like checkpoints.
+"""
+import copy
+import json
+import os
+
+import numpy as np
+from neat.reporting import BaseReporter
+
+import engine
+
+FORMAT_VERSION = 1
+#y is stored in tenths of a pixel, every move of the bird is a whole number of them
+Y_SCALE = 10
+#where every game starts the bird, as flappy_bird.simulate does
+BIRD_X, BIRD_Y = 230, 350
+
+
+class Recorder:
+    """
+    Collects the first bird of a game while it's played, passed to
+    flappy_bird.simulate as its render argument. A bird that jumped in a
+    frame ends it with tick_count at 0.
+    """
+
+    def __init__(self):
+        self.y = []
+        self.tilt = []
+        self.jumps = []
+        self.alive = []
+        self.score = []
+
+    def __call__(self, flock, pipes, base, score):
+        self.y.append(flock.y[0])
+        self.tilt.append(flock.tilt[0])
+        self.jumps.append(flock.tick_count[0] == 0)
+        self.alive.append(flock.alive[0])
+        self.score.append(score)
+
+
+class Actions:
+    """
+    The jumps of the birds of the first course, collected while a game is
+    played by flappy_bird.simulate as its actions argument. Every frame adds
+    a row of one bit per bird packed by np.packbits and the score, and the
+    frames every bird lived are counted, so the game of any of them can be
+    rebuilt by episode() without playing it again.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.score = []
+        self.lived = None
+
+    def __call__(self, flock, size, score):
+        """ Adds the frame just played by the first size birds of flock. """
+        # a bird that jumped in a frame ends it with tick_count at 0
+        self.rows.append(np.packbits(flock.tick_count[:size] == 0))
+        self.score.append(score)
+        if self.lived is None:
+            self.lived = np.zeros(size, dtype=int)
+        self.lived[flock.alive[:size]] = len(self.score)
+
+    def finish(self):
+        """ Stacks the frames into arrays, which are far cheaper to send between processes. """
+        self.rows = np.array(self.rows, dtype=np.uint8).reshape(len(self.rows), -1)
+        self.score = np.array(self.score, dtype=np.int64)
+
+    def episode(self, bird, seed, warmup, info=None):
+        """
+        The game of the bird-th bird: its jumps replayed through the physics of
+        engine.Bird, up to the frame it crashed in.
+        """
+        frames = len(self.score) if self.lived is None else min(self.lived[bird] + 1, len(self.score))
+        jumps = (self.rows[:frames, bird // 8] >> (7 - bird % 8)) & 1 == 1
+        flier = engine.Bird(BIRD_X, BIRD_Y)
+        y = np.empty(frames)
+        tilt = np.empty(frames)
+        for frame, jump in enumerate(jumps.tolist()):
+            flier.move()
+            if jump:
+                flier.jump()
+            y[frame] = flier.y
+            tilt[frame] = flier.tilt
+        return Episode(seed, warmup, y, tilt, jumps, self.score[:frames].copy(), info)
+
+
+class Episode:
+    """ A recorded game, with the state of the bird at the end of every frame. """
+
+    def __init__(self, seed, warmup, y, tilt, jumps, score, info=None):
+        self.seed = seed
+        self.warmup = warmup
+        self.y = y
+        self.tilt = tilt
+        self.jumps = jumps
+        self.score = score
+        self.info = info or {}
+
+    def __len__(self):
+        return len(self.y)
+
+    @staticmethod
+    def from_recorder(recorder, seed, warmup, info=None):
+        # the frames after the bird died only show it where it crashed
+        frames = recorder.alive.index(False) + 1 if False in recorder.alive else len(recorder.alive)
+        return Episode(seed, warmup, np.array(recorder.y[:frames]), np.array(recorder.tilt[:frames]),
+                       np.array(recorder.jumps[:frames], dtype=bool), np.array(recorder.score[:frames]), info)
+
+    def save(self, filename):
+        y = np.round(self.y * Y_SCALE).astype(np.int64)
+        header = dict(self.info, version=FORMAT_VERSION, seed=self.seed, warmup=self.warmup, frames=len(self))
+        np.savez_compressed(
+            filename,
+            header=np.array(json.dumps(header)),
+            y_delta=np.diff(y, prepend=0).astype(np.int16),
+            tilt_delta=np.diff(self.tilt.astype(np.int64), prepend=0).astype(np.int16),
+            jumps=np.packbits(self.jumps),
+            passed=np.packbits(np.diff(self.score, prepend=0) > 0),
+        )
+
+    @staticmethod
+    def load(filename):
+        with np.load(filename, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            if header['version'] != FORMAT_VERSION:
+                raise ValueError("{0} has episode format {1}, expected {2}".format(
+                    filename, header['version'], FORMAT_VERSION))
+            frames = header['frames']
+            y = np.cumsum(data['y_delta'].astype(np.int64)) / Y_SCALE
+            tilt = np.cumsum(data['tilt_delta'].astype(np.int64)).astype(float)
+            jumps = np.unpackbits(data['jumps'], count=frames).astype(bool)
+            score = np.cumsum(np.unpackbits(data['passed'], count=frames))
+        return Episode(header['seed'], header['warmup'], y, tilt, jumps, score, header)
+
+
+class World:
+    """
+    The pipes and the base of an episode, stepped frame by frame the way
+    simulate moves them. seek() goes to any frame, starting over from the
+    first one when going back.
+    """
+
+    def __init__(self, episode):
+        self.episode = episode
+        self.course = engine.make_course(episode.seed, warmup=episode.warmup)
+        self.reset()
+
+    def reset(self):
+        self.frame = -1
+        self.score = 0
+        self.pipes = engine.Pipes()
+        self.pipes.add(700, self.course[0])
+        self.base = engine.Base(engine.FLOOR)
+
+    def step(self):
+        self.frame += 1
+        score = int(self.episode.score[self.frame])
+        leaving = 0
+        for pipe in self.pipes:
+            if not pipe.passed and pipe.x < 230 and score > self.score:
+                pipe.passed = True
+            if pipe.x + pipe.WIDTH < 0:
+                leaving += 1
+        self.pipes.move()
+        if score > self.score:
+            self.score = score
+            self.pipes.add(700, self.course[score % len(self.course)])
+        for _ in range(leaving):
+            self.pipes.drop()
+        self.base.move()
+
+    def seek(self, frame):
+        frame = min(max(frame, 0), len(self.episode) - 1)
+        if frame < self.frame:
+            self.reset()
+        while self.frame < frame:
+            self.step()
+
+
+def record(simulate, genome, config, seed, info=None):
+    """ Plays genome alone on the first course of seed and returns the game as an Episode. """
+    single = copy.copy(config)
+    single.courses = 1
+    recorder = Recorder()
+    simulate([genome], single, seed, render=recorder)
+    return Episode.from_recorder(recorder, seed, config.course_warmup, info)
+
+
+class EpisodeRecorder(BaseReporter):
+    """
+    Records the game of the best genome of every generation into directory,
+    as episode-<generation>.npz. The game is rebuilt from the Actions that
+    evaluator, a parallel.ParallelEvaluator recording them, brought back
+    with the fitness. Only a best genome that wasn't played this generation,
+    found in the fitness cache or timed out, plays its game again with
+    simulate.
+    """
+
+    def __init__(self, evaluator, simulate, seeds, directory='episodes'):
+        self.evaluator = evaluator
+        self.simulate = simulate
+        self.seeds = seeds
+        self.directory = directory
+        self.generation = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        info = {'generation': self.generation, 'genome': best_genome.key, 'fitness': best_genome.fitness}
+        played = self.evaluator.actions.get(best_genome.key)
+        if played is None:
+            episode = record(self.simulate, best_genome, config, self.seeds.current, info)
+        else:
+            actions, bird = played
+            episode = actions.episode(bird, self.seeds.current, config.course_warmup, info)
+        episode.save(os.path.join(self.directory, 'episode-{0}.npz'.format(self.generation)))
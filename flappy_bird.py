@@ -1,399 +1,200 @@
-from operator import ne
-import pygame
-import neat
+import configparser
 import os
+import functools
 import random
-import visualize
 import pickle
 
-pygame.font.init()
-pygame.init()
-
-# Defining the display window
-WIN_WIDTH, WIN_HEIGHT = 570, 800
-win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Flappy Bird")
-
-
-# Getting and defining all surfaces (texts/images) as constants
-BIRD_IMGS = [
-    pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bird1.png"))), 
-    pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bird2.png"))),
-    pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bird3.png")))
-]
-PIPE_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "pipe.png")))
-BASE_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "base.png")))
-BG_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bg.png")))
-STAT_FONT = pygame.font.SysFont("roboto", 50)
-
-#frame rate for the game i.e. the #times the display will be refreshed in one second
-FPS = 60
-
-# Making classes to represent each entity and define their behaviour in the game
-class Bird:
-    IMGS = BIRD_IMGS
-    MAX_ROTATION = 25       #range upto which the player can tilt the bird
-    ROT_VEL = 20            #rotation allowed per frame/move
-    ANIMATION_TIME = 5      #time for which each animation will hold i.e. the rate at which the bird all flap its wings
-
-
-    def __init__(self, x, y):
-        #starting coordinates for the bird
-        self.x = x
-        self.y = y
-        #starting orientation of the bird
-        self.tilt = 0               #the bird looks straight towards the right
-        self.tick_count = 0         #tracks the no. of seconds elapsed since the last move. 
-                                    #will be used for physics calc for the bird
-        self.vel = 0                #bird is stationary
-        self.height = self.y
-        self.img_count = 0          #image currently being rendered
-        self.img = self.IMGS[0]     
-
-    def jump(self):
-        self.vel = -10.5            #pygame takes the upper-left corner of the diaplay as (0,0)
-                                    #going left increases x, while going down increases y
-                                    #therefore, to go up, negative value is required
-        
-        self.tick_count = 0         #keeps track of when the last jump occured
-        self.height = self.y        #height from which the jump was made
-
-
-    #method to define the movement of the bird.
-    #flappy bird only moves up and down
-    def move(self):
-        self.tick_count += 1        #tracks the no. of moves made since the last jump
-
-        #formula defining the arc for the bird when it jumps
-        #displacement disp is in pixels
-        disp = self.vel + 1.8*(self.tick_count/2)
-
-        #setting a limit to the velocity when going downwards and upwards
-        if disp > 8:
-            disp = 8
-        if disp < 0:
-            disp -= 2
-
-        self.y = self.y+disp
-
-        if disp < 0 or self.y < self.height + 50:
-            if self.tilt < self.MAX_ROTATION:
-                self.tilt = self.MAX_ROTATION   #while the bird is going up, we don't want it to climb up 90 deg
-        else:
-            if self.tilt > -90:                 #but while going down, it may look like nose-diving
-                self.tilt -= self.ROT_VEL
-
-    def draw(self, win):
-        self.img_count += 1
-
-        #decides on which image to show based on the image_count 
-        if self.img_count < self.ANIMATION_TIME:
-            self.img = self.IMGS[0]       
-        elif self.img_count < self.ANIMATION_TIME*2:
-            self.img = self.IMGS[1]
-        elif self.img_count < self.ANIMATION_TIME*3:
-            self.img = self.IMGS[2]
-        elif self.img_count < self.ANIMATION_TIME*4:
-            self.img = self.IMGS[1]
-        elif self.img_count < self.ANIMATION_TIME*4 + 1:
-            self.img = self.IMGS[0]
-            self.img_count = 0
-
-        if self.tilt <= -80:
-            self.img = self.IMGS[1]
-            self.img_count = self.ANIMATION_TIME*2
-
-
-        #to rotate the image around its center
-        rotated_image = pygame.transform.rotate(self.img, self.tilt)
-        new_rect = rotated_image.get_rect(center=self.img.get_rect(topleft=(self.x,self.y)).center)
-        win.blit(rotated_image, new_rect.topleft)
-
-
-    #function handling collisions with objects
-    def get_mask(self):
-        return pygame.mask.from_surface(self.img)
-
-        
-
-class Pipe:
-    GAP = 200   #pixels in between two pipes
-    VEL = 5
-
-    def __init__(self, x):
-        self.x = x
-        self.height = 0
-        
-
-        self.top = 0
-        self.bottom = 0
-        self.PIPE_TOP = pygame.transform.flip(PIPE_IMG, False, True)
-        self.PIPE_BOTTOM = PIPE_IMG
-
-        self.passed = False
-        self.set_height(random.randrange(50,450))
-
-    #sets the height for the pipe
-    def set_height(self, height):
-        self.height = height
-        self.top = self.height-self.PIPE_TOP.get_height()   #to get the x-coordinate from the height, as per the pygame coordinate
-        self.bottom =self.height + self.GAP
-
-    #method to define the movement of the pipes accross the screen
-    #the pipes move only from right to left so as to make an illusion of the bird moving forward
-    def  move(self):
-        self.x -= self.VEL
-
-    def draw(self, win):
-        win.blit(self.PIPE_TOP, (self.x, self.top))
-        win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
-    
-    #masks, in pygame, are used to detect pixel perfect collision
-    #masks basically monitors the position of the pixels against a transparent background
-    #each object on screen will be enclosed in a square and mask on that square will distinguish the 
-    #object pixels against the background pixels. 
-    #Overlapping of masks of two different objects will indicate the collision of the objects, rather
-    #than that of the squares. therefore, making the collision perfect in the user's prespective as well.
-
-    def collide(self, bird):
-        bird_mask = bird.get_mask()
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP)
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM)
-
-        #offset of the bird from the top pipe and bottom pipe
-        top_offset = (self.x - bird.x, self.top - round(bird.y))
-        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
-
-        #finding the point of overlap between bird mask and bottom mask using the bottom_offset
-        b_point = bird_mask.overlap(bottom_mask, bottom_offset)
-        #finding the point of overlap between bird mask and top mask using the top_offset
-        t_point = bird_mask.overlap(top_mask, top_offset)
-
-        #if no overlap, overlap() returns none
-        if t_point or b_point :
-            #some collision occured
-            return True
-        #no collision occured
-        return False
-
-
-class Base:
-    VEL = 5     #defining same velocity as pipe so that they seem to move at the same pace
-    WIDTH = BASE_IMG.get_width()
-    IMG = BASE_IMG
-
-    def __init__(self, y):
-        self.y = y
-        self.x1 = 0
-        self.x2 = self.WIDTH
-
-    def move(self):
-        self.x1 -= self.VEL
-        self.x2 -= self.VEL
-
-        #cycling back the images as and when they go off window, giving an isllusion of endless base
-        #moving to the left
-        if self.x1 + self.WIDTH < 0:
-            self.x1 = self.x2 + self.WIDTH
-
-        if self.x2 + self.WIDTH < 0:
-            self.x2 = self.x1 + self.WIDTH
-
-    #menthod to draw the base onto the display window
-    def draw(self, win):
-        win.blit(self.IMG, (self.x1, self.y))
-        win.blit(self.IMG, (self.x2, self.y))
-
-
-# Function to redraw the window for every iteration of the game loop
-
-#function to render the display window
-def draw_window(win, birds, pipes, base, score):
-    win.blit(BG_IMG, (0,0))     #blit() just renders the provided surface onto the display
-    
-    for pipe in pipes:
-        pipe.draw(win)
-    
-    text = STAT_FONT.render("Score: " + str(score), 1, (255,255,255))
-    win.blit(text, (WIN_WIDTH - 10 - text.get_width(), 10))
-
-    base.draw(win)
-
-    for bird in birds:
-        bird.draw(win)
-
-    pygame.display.update()
-
-
-def eval_fitness(genomes, config):
-    nets = []
-    ge = []
-    birds = []
-
-    for _, g in genomes:
-        net = neat.nn.FeedForwardNetwork.create(g, config)
-        nets.append(net)
-        birds.append(Bird(230,350))
-        g.fitness = 0
-        ge.append(g)
-
-    base = Base(730)
-    pipes = [Pipe(700)]
-    # use clock object to set the tick rate i.e no. of frames per sec
-    # prevents the game from using the system's speed and use this measure of time instead
-    clock = pygame.time.Clock()
+import numpy as np
+
+import batchnet
+import engine
+import parallel
+import profiling
+
+# Each mode imports what it needs when it starts: pygame and the sprites only
+# for the play modes, neat for training, matplotlib and graphviz for the plots
+
+WIN_WIDTH, WIN_HEIGHT = engine.WIN_WIDTH, engine.WIN_HEIGHT
+
+#frames between two checks for birds that can't catch up with the leader any more
+PRUNE_INTERVAL = 50
+#most fitness a leader can still lose: while inside the window its centre bonus
+#is never negative, and the frame it flies over the top it earns 0.1*y for a y
+#as low as minus the fastest rise (a jump of 10.5, less 0.9 of gravity, plus
+#the 2 every upward move gets), then may hit a pipe for another 1
+PRUNE_SLACK = 1 + 0.1 * (10.5 - 0.9 + 2)
+
+#the most generations a training run goes through
+GENERATIONS = 10000
+
+#generations the statistics plots show at most, longer runs are thinned out
+PLOT_POINTS = 500
+
+NODE_NAMES = {-1:'Bird', -2: 'Pipe Dist', -3: 'Top Pipe', -4: 'Bottom Pipe', 0:'Jump'}
+
+
+def simulate(genomes, config, seed, max_frames=None, max_pipes=None, prune=False, info=None, timer=None,
+             render=None, pixel_perfect=True, actions=None):
+    """
+    Plays one game with a bird per genome on the headless engine, nothing is drawn
+    unless render is given.
+    The birds are kept in a single engine.Flock and advanced together each frame,
+    with every network evaluated in one batch. Every genome plays config.courses
+    courses derived from seed at once: the pipes of all courses move in step, so
+    only the gap heights differ and one flock holds a bird per genome and course.
+    Without prune, any split of the genomes played on the same seed scores the
+    same. Returns an (n, courses) array with the fitness of every genome on
+    every course.
+
+    The game also ends after max_frames frames or max_pipes pipes. With a frame
+    budget, prune stops playing the birds that can no longer catch up with the
+    leader of their course in this flock, their fitness stays where it was.
+    Pruned fitness therefore depends on the other genomes played with it.
+    A dict passed as info receives the number of frames played and the score.
+    A profiling.PhaseTimer passed as timer is charged with the time spent in
+    every phase of the loop.
+    render(flock, pipes, base, score) is called at the end of every frame, such
+    as a display.FlockView to watch the game. The first len(genomes) birds of
+    the flock play the first course, which the pipes are drawn from. Without
+    pixel_perfect the birds crash on the analytic gap test, see
+    engine.Pipe.collide. An episodes.Actions passed as actions collects the
+    jumps of the birds of the first course, from which their games can be
+    shown again.
+    """
+    timer = timer or profiling.NULL_TIMER
+    timer.start()
+    # only the first course has the warmup pipes, the others are random from the start
+    seeds = engine.course_seeds(seed, config.courses)
+    courses = np.array([engine.make_course(s, warmup=config.course_warmup if i == 0 else 0)
+                        for i, s in enumerate(seeds)])
+    course_of = np.repeat(np.arange(len(seeds)), len(genomes))
+    genome_of = np.tile(np.arange(len(genomes)), len(seeds))
+    nets = batchnet.BatchNetwork.create(genomes, config)
+    flock = engine.Flock(len(course_of), 230, 350)
+
+    base = engine.Base(engine.FLOOR)
+    pipes = engine.Pipes()
+    #gap height of every pipe as seen by every bird, by the slot of the pipe
+    heights = np.empty((len(pipes.records), len(flock)), dtype=courses.dtype)
+    np.take(courses[:, 0], course_of, out=heights[pipes.add(700, courses[0, 0]).slot])
 
     score = 0
-    run = True
-
-    #the game loop
-    while run:
-        clock.tick(FPS)      
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.quit()
-                quit()
-        
-        # check if in training
-        if len(genomes) > 1:
-            # end loop if fitness threshold reached
-            if max([g.fitness for _, g in genomes]) > config.fitness_threshold:
-                run = False
-                pygame.quit()
-                break
-        
-        pipe_index = 0
-        if len(birds) > 0:
-            if len(pipes) > 1 and pipes[1].x + pipes[1].PIPE_TOP.get_width()/2 < WIN_WIDTH:
-                pipe_index = 1
-        else:
-            run = False
+    frames = 0
+    center = WIN_HEIGHT/2
+    #most fitness a bird can earn in a frame, and frames it takes the next pipe to reach the birds
+    frame_reward = center * 0.1
+    frames_per_pipe = (700 - flock.x) // engine.Pipe.VEL
+    #upper bound on the best fitness, only replaced by the real maximum when it could cross the threshold
+    best = 0.0
+    timer.lap('setup')
+
+    #the game loop, runs as fast as the cpu allows until every bird is dead
+    while flock.alive.any():
+        if max_frames is not None and frames >= max_frames:
             break
+        # end loop if fitness threshold reached
+        if best > config.fitness_threshold:
+            best = flock.fitness.max()
+            if best > config.fitness_threshold:
+                break
 
-        for x, bird in enumerate(birds):
-            bird.move()
-            # increase fitness for every small forward progress
-            # and increase fitness if bird remains in center
-            center = WIN_HEIGHT/2
-            bird_from_center = abs(center - bird.y)
-            bird_from_edge = center - bird_from_center
-            ge[x].fitness += bird_from_edge * 0.1
-
-            output = nets[x].activate((bird.y, pipes[pipe_index].x, pipes[pipe_index].height, pipes[pipe_index].bottom))
-
-            if output[0] > 0.5:
-                bird.jump()
+        next_pipe = pipes.next
+        next_height = heights[next_pipe.slot]
+
+        flock.move()
+        # increase fitness for every small forward progress
+        # and increase fitness if bird remains in center
+        alive = flock.alive
+        flock.fitness[alive] += (center - np.abs(center - flock.y[alive])) * 0.1
+        timer.lap('physics')
+
+        # one forward pass decides the jump of every live bird
+        index = np.flatnonzero(alive)
+        inputs = np.empty((len(index), 4))
+        inputs[:, 0] = flock.y[index]
+        inputs[:, 1] = next_pipe.x
+        inputs[:, 2] = next_height[index]
+        inputs[:, 3] = inputs[:, 2] + next_pipe.GAP
+        jumps = np.zeros(len(flock), dtype=bool)
+        jumps[index] = nets.activate(inputs, genome_of[index])[:, 0] > 0.5
+        flock.jump(jumps)
+        timer.lap('network')
 
         add_pipe = False
-        rem = []
+        leaving = 0
         for pipe in pipes:
-            for x, bird in enumerate(birds):
-                if pipe.collide(bird):
-                    ge[x].fitness -= 1
-                    birds.pop(x)
-                    nets.pop(x)
-                    ge.pop(x)
-            
-                if not pipe.passed and pipe.x < bird.x:
-                    pipe.passed = True
-                    add_pipe = True
-
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:
-                rem.append(pipe)
-            
-            pipe.move()
-
-        if add_pipe:
-            score += 1
-            # all birds which would have passed the pipes would remain in the lists
-            # so we incrent fitness fo all
-            for g in ge:
-                g.fitness += 5
-            pipe = Pipe(700)
-            if len(genomes) > 1 and score < 10:
-                if score % 2 == 0:
-                    pipe.set_height(50)
-                else:
-                    pipe.set_height(500)
-            pipes.append(pipe)
-
-        for r in rem:
-            pipes.remove(r)
-
-        for x, bird in enumerate(birds):
-            # check if bird has hit ground
-            if bird.y + bird.img.get_height() > 730 or bird.y < 0:
-                birds.pop(x)
-                nets.pop(x)
-                ge.pop(x)
-
-        base.move()
-        draw_window(win, birds, pipes, base, score)
-
-
-def human_play():
-    base = Base(730)
-    pipes = [Pipe(700)]
-    bird = Bird(230,350)
-    # use clock object to set the tick rate i.e no. of frames per sec
-    # prevents the game from using the system's speed and use this measure of time instead
-    clock = pygame.time.Clock()
-
-    score = 0
-
-    run = True
-
-    #the game loop
-    while run:
-        clock.tick(FPS)      
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.quit()
-                quit()
+            hits = pipe.collide_flock(flock, heights[pipe.slot], pixel_perfect)
+            flock.fitness[hits] -= 1
+            flock.alive[hits] = False
+            timer.lap('collision')
 
-        # move bird
-        bird.move()
-        for key in pygame.key.get_pressed():
-            if key:
-                bird.jump() 
-
-        add_pipe = False
-        rem = []
-        for pipe in pipes:
-            if pipe.collide(bird):
-                bird = None
-                return
-        
-            if not pipe.passed and pipe.x < bird.x:
+            if not pipe.passed and pipe.x < flock.x and flock.alive.any():
                 pipe.passed = True
                 add_pipe = True
 
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:
-                rem.append(pipe)
-            
-            pipe.move()
+            #the pipes are in order, only the first ones can be leaving
+            if pipe.x + pipe.WIDTH < 0:
+                leaving += 1
+        pipes.move()
+        timer.lap('pipes')
+
+        frames += 1
+        best += frame_reward
 
         if add_pipe:
             score += 1
-            pipes.append(Pipe(700))
+            best += 5
+            # every bird still alive has passed the pipe
+            flock.fitness[flock.alive] += 5
+            column = score % courses.shape[1]
+            np.take(courses[:, column], course_of, out=heights[pipes.add(700, courses[0, column]).slot])
+            if max_pipes is not None and score >= max_pipes:
+                break
 
-        for r in rem:
-            pipes.remove(r)
+        for _ in range(leaving):
+            pipes.drop()
+        timer.lap('pipes')
 
         # check if bird has hit ground
-        if bird.y + bird.img.get_height() > 730 or bird.y < 0:
-            bird = None
-            return
+        flock.alive[flock.out_of_bounds()] = False
+        timer.lap('physics')
+
+        if prune and max_frames is not None and frames % PRUNE_INTERVAL == 0 and flock.alive.any():
+            # the leader of each course ends up at most PRUNE_SLACK below its fitness now, even if it crashes
+            remaining = max_frames - frames
+            reachable = flock.fitness + remaining * frame_reward + 5 * (remaining // frames_per_pipe + 1)
+            leaders = np.full(len(seeds), -np.inf)
+            np.maximum.at(leaders, course_of[flock.alive], flock.fitness[flock.alive])
+            flock.alive &= reachable >= leaders[course_of] - PRUNE_SLACK
+            timer.lap('pruning')
 
         base.move()
-        draw_window(win, [bird], pipes, base, score)
+        timer.lap('pipes')
+
+        if actions is not None:
+            actions(flock, len(genomes), score)
+            timer.lap('actions')
+        if render is not None:
+            render(flock, pipes, base, score)
+            timer.lap('render')
+
+    if actions is not None:
+        actions.finish()
+    if info is not None:
+        info['frames'] = frames
+        info['score'] = score
+    return flock.fitness.reshape(len(seeds), len(genomes)).T
 
 
-def train():
-    global FPS
-    FPS = 6000
+def human_play(timer=None, pixel_perfect=True):
+    import pygame
+    import display
+
+    display.play(lambda bird, pipe: any(pygame.key.get_pressed()), timer, pixel_perfect=pixel_perfect)
+
+
+def load_config():
+    import neat
 
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, "config.txt")
@@ -405,39 +206,265 @@ def train():
         neat.DefaultStagnation,
         config_path
     )
-    p = neat.Population(config)
 
-    p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    p.add_reporter(stats)
+    # neat ignores the [Evaluation] section, it sets up how simulate scores the genomes
+    parameters = configparser.ConfigParser()
+    parameters.read(config_path)
+    config.courses = parameters.getint("Evaluation", "courses", fallback=1)
+    config.course_warmup = parameters.getint("Evaluation", "warmup", fallback=10)
+    config.fitness_aggregation = parameters.get("Evaluation", "aggregation", fallback="mean")
+    if config.fitness_aggregation not in parallel.AGGREGATIONS:
+        raise ValueError("Unknown fitness aggregation {0!r}, expected one of {1}".format(
+            config.fitness_aggregation, ", ".join(sorted(parallel.AGGREGATIONS))))
+
+    # the vectorized species set reads the same [DefaultSpeciesSet] parameters
+    backend = parameters.get("Speciation", "backend", fallback="default")
+    if backend == "vectorized":
+        import speciation
+        config.species_set_type = speciation.VectorSpeciesSet
+    elif backend != "default":
+        raise ValueError("Unknown speciation backend {0!r}, expected default or vectorized".format(backend))
+    return config
+
+
+def train(workers=1, seed=None, resume=None, checkpoint_every=100, checkpoint_seconds=300, fixed_course=False,
+          cache_size=10000, max_frames=None, max_pipes=None, prune=False, timings=False, profile_generation=None,
+          plots=True, telemetry="telemetry.jsonl", show=None, speed=1.0, skip=600, island=None, chunk_size=None,
+          eval_timeout=None, episodes=None, reports=None, report_every=None, report_formats=("png", "json"),
+          pixel_perfect=True):
+    """
+    Evolves a population until the fitness threshold or GENERATIONS, then saves
+    the winner as model and model.fbnn. As one island of an island model
+    (an islands.Island) every file written starts with the island's prefix,
+    and its best genomes are traded with the other islands. With episodes,
+    the game of the best genome of every generation is recorded in that
+    directory. With reports, a background process draws the network of the
+    best genome and the statistics so far into that directory every
+    report_every generations (every checkpoint by default), in report_formats.
+    pixel_perfect goes to simulate, in every worker.
+    """
+    import neat
+    import cache
+    import checkpoint
+    import compiled
+    import reporters
+
+    config = load_config()
+
+    if resume:
+        # the checkpoint brings back its own run seed and RNG state
+        p, seed = checkpoint.restore_checkpoint(resume, config)
+        print("Resuming {0} at generation {1}".format(resume, p.generation))
+    else:
+        if seed is None:
+            seed = random.randrange(2**32)
+        # the same seed replays the same NEAT mutations and the same courses
+        random.seed(seed)
+        p = neat.Population(config)
+    print("Run seed: {0}".format(seed))
 
-    winner = p.run(eval_fitness, 10000)
+    p.add_reporter(neat.StdOutReporter(True))
+    if config.courses > 1:
+        p.add_reporter(reporters.CourseFitnessReporter())
+
+    seeds = reporters.WorldSeeds(seed, fixed_course)
+    p.add_reporter(seeds)
+    prefix = "" if island is None else island.prefix
+    if island is not None:
+        import islands
+
+        # ahead of the checkpoints, so a checkpoint holds the migrants of its generation
+        p.add_reporter(islands.Migration(p, island))
+    p.add_reporter(checkpoint.Checkpointer(p, checkpoint_every, checkpoint_seconds or None,
+                                           filename_prefix=prefix + "checkpoint-", run_seed=seed))
+
+    episode = functools.partial(simulate, max_frames=max_frames, max_pipes=max_pipes, prune=prune,
+                                pixel_perfect=pixel_perfect)
+    if show:
+        # the window belongs to this process, so the games can't be handed to workers
+        if workers > 1:
+            raise ValueError("Watching the training needs a single worker")
+        import display
+
+        episode = functools.partial(episode, render=display.FlockView(show, speed, skip, config.courses))
+    timer = None
+    if timings:
+        timer = profiling.PhaseTimer()
+        p.add_reporter(reporters.TimingReporter(timer))
+    # the statistics stream to a file instead of piling up in memory
+    p.add_reporter(reporters.TelemetryReporter(telemetry, timer, append=bool(resume)))
+    if profile_generation is not None:
+        p.add_reporter(reporters.ProfileReporter(profile_generation))
+    report_worker = None
+    if reports:
+        import visualize
+
+        # added after the telemetry, the worker reads the generation it reports from the file
+        report_worker = visualize.ReportWorker(config, prefix + reports, telemetry, report_formats, NODE_NAMES,
+                                               PLOT_POINTS)
+        p.add_reporter(reporters.VisualReporter(report_worker, report_every or checkpoint_every))
+
+    evaluator = parallel.ParallelEvaluator(workers, episode, seeds, eval_timeout, timer, chunk_size,
+                                           recorded=bool(episodes))
+    if episodes:
+        import episodes as recording
+
+        # played again without the viewer, only by a best genome the evaluator didn't play
+        replayed = functools.partial(simulate, max_frames=max_frames, max_pipes=max_pipes,
+                                     pixel_perfect=pixel_perfect)
+        p.add_reporter(recording.EpisodeRecorder(evaluator, replayed, seeds, prefix + episodes))
+
+    # a fitness is only met again on the same course, and a pruned one depends
+    # on the genomes it was played with
+    evaluate = evaluator.evaluate
+    if cache_size > 0 and fixed_course and not prune:
+        fitness_cache = cache.FitnessCache(evaluator, seeds, cache_size)
+        p.add_reporter(fitness_cache)
+        evaluate = fitness_cache.evaluate
+    # whatever goes wrong, the workers, the neighbours and the queued reports aren't left hanging
+    try:
+        winner = p.run(evaluate, GENERATIONS - p.generation)
+        print('\nBest genome:\n{!s}'.format(winner))
+
+        # save trained model, and the compiled network --ai plays with, before anything else can go wrong
+        pickle.dump(winner, open(prefix + "model", "wb"))
+        compiled.export(winner, config, prefix + "model.fbnn")
+
+        if plots:
+            import visualize
+
+            visualize.draw_net(config, winner, view=False, node_names=NODE_NAMES, prune_unused=True)
+            stats = visualize.Telemetry(telemetry)
+            stats.update()
+            stats.plot(ylog=False, view=False, max_points=PLOT_POINTS)
+    finally:
+        evaluator.close()
+        if island is not None:
+            island.transport.close()
+        if report_worker is not None:
+            report_worker.close()
+
+
+def train_steady(evaluations, workers=1, seed=None, eval_timeout=None, max_frames=None, max_pipes=None,
+                 prune=False, pixel_perfect=True):
+    """
+    Evolves without generations: every worker gets a new child as soon as it
+    is done with the last one. Saves the best genome seen after evaluations
+    games, like train.
+    """
+    import compiled
+    import steady
+
+    config = load_config()
+    if seed is None:
+        seed = random.randrange(2**32)
+    random.seed(seed)
+    print("Run seed: {0}".format(seed))
+
+    episode = functools.partial(simulate, max_frames=max_frames, max_pipes=max_pipes, prune=prune,
+                                pixel_perfect=pixel_perfect)
+    winner = steady.SteadyState(config, episode, seed, workers, eval_timeout).run(evaluations)
 
     print('\nBest genome:\n{!s}'.format(winner))
+    pickle.dump(winner, open("model", "wb"))
+    compiled.export(winner, config, "model.fbnn")
 
-    node_names = {-1:'Bird', -2: 'Pipe Dist', -3: 'Top Pipe', -4: 'Bottom Pipe', 0:'Jump'}
-    visualize.draw_net(config, winner, view=False, node_names=node_names, prune_unused=True)
-    visualize.plot_stats(stats, ylog=False, view=False)
-    visualize.plot_species(stats, view=False)
 
-    # save trained model
-    pickle.dump(winner, open("model", "wb"))
+def train_islands(num_islands, seed=None, resume=False, migration_interval=10, migrants=2, **kwargs):
+    """
+    Runs num_islands trainings in their own processes, passing migrants around
+    a ring of queues. The seed of the run gives every island its own seed, and
+    with resume each island carries on from its newest checkpoint. The other
+    keyword arguments go to train.
+    """
+    import multiprocessing
+    import islands
 
+    if seed is None:
+        seed = random.randrange(2**32)
+    print("Run seed: {0}".format(seed))
 
-def ai_play():
-    local_dir = os.path.dirname(__file__)
-    config_path = os.path.join(local_dir, "config.txt")
+    queues = [multiprocessing.Queue() for _ in range(num_islands)]
+    transports = [islands.QueueTransport(queues[i], queues[(i + 1) % num_islands]) for i in range(num_islands)]
+    processes = []
+    for i, (transport, island_seed) in enumerate(zip(transports, engine.course_seeds(seed, num_islands))):
+        island = islands.Island(i, transport, migration_interval, migrants)
+        args = dict(kwargs, seed=island_seed, island=island, plots=False,
+                    telemetry=island.prefix + "telemetry.jsonl",
+                    resume=islands.latest_checkpoint(i) if resume else None)
+        processes.append(multiprocessing.Process(target=train, kwargs=args))
 
-    config = neat.config.Config(
-        neat.DefaultGenome,
-        neat.DefaultReproduction,
-        neat.DefaultSpeciesSet,
-        neat.DefaultStagnation,
-        config_path
-    )
+    for process in processes:
+        process.start()
+    islands.join_islands(processes, transports)
+
+
+def export_model(model_path, output=None):
+    """ Compiles a pickled genome (such as model) into a network file for --ai. """
+    import compiled
+
+    output = output or model_path + ".fbnn"
+    genome = pickle.load(open(model_path, "rb"))
+    compiled.export(genome, load_config(), output)
+    print("Wrote {0}".format(output))
+
+
+def ai_play(model_path="model.fbnn", timer=None, speed=1.0, skip=600, pixel_perfect=True):
+    import compiled
+    import display
 
-    saved_model = pickle.load(open("model", "rb"))
-    eval_fitness([("", saved_model)], config)
+    net = compiled.CompiledNetwork.load(model_path)
+
+    def controller(bird, pipe):
+        output = net.activate((bird.y, pipe.x, pipe.height, pipe.bottom))
+        return output[0] > 0.5
+
+    display.play(controller, timer, display.Scheduler(speed, skip), controls=True, pixel_perfect=pixel_perfect)
+
+
+def replay(filename, start=0, speed=1.0, skip=600):
+    import display
+    import episodes
+
+    episode = episodes.Episode.load(filename)
+    print("Episode of {0} frames on course {1}".format(len(episode), episode.seed))
+    display.replay(episode, display.Scheduler(speed, skip), start)
+
+
+def run_tournament(model_paths, courses=32, seed=None, workers=1, max_frames=None, output=None, min_score=None,
+                   pixel_perfect=True):
+    """
+    Plays the pickled genomes in model_paths against each other on the same
+    courses and prints the results, also written as JSON to output. Returns
+    False when a model's mean score is below min_score.
+    """
+    import tournament
+
+    models = tournament.load_models(model_paths)
+    play = functools.partial(simulate, pixel_perfect=pixel_perfect)
+    report = tournament.run(play, models, load_config(), seed or 0, courses, workers,
+                            max_frames or tournament.MAX_FRAMES)
+    print(tournament.format_table(report))
+    if output:
+        tournament.save(report, output)
+        print("Wrote {0}".format(output))
+
+    if min_score is not None:
+        failed = [row['model'] for row in report['models'] if row['score']['mean'] < min_score]
+        for name in failed:
+            print("{0} scores below {1}".format(name, min_score))
+        return not failed
+    return True
+
+
+def benchmark(sizes, output):
+    import bench
+
+    config = load_config()
+
+    # the trained model survives, which keeps the whole population playing
+    player = pickle.load(open(os.path.join(os.path.dirname(__file__), "model"), "rb"))
+    bench.run(config, simulate, player, sizes, output=output)
 
 
 if __name__ == "__main__":
@@ -449,14 +476,136 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(about)
     parser.add_argument("--train", help="train model to play the game", action="store_true")
     parser.add_argument("--ai", help="let the ai play", action="store_true")
+    parser.add_argument("--model", help="compiled network the ai plays with", default="model.fbnn")
+    parser.add_argument("--export", metavar="MODEL", help="compile a pickled genome into MODEL.fbnn")
     parser.add_argument("--human", help="try playing yourself", action="store_true")
+    parser.add_argument("--bench", help="measure the speed of the game loop and of training", action="store_true")
+    parser.add_argument("--bench-sizes", help="population sizes to benchmark", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("--bench-output", help="JSON file the benchmark results go to", default="bench.json")
+    parser.add_argument("--workers", help="processes evaluating each generation while training",
+                        type=int, default=1)
+    parser.add_argument("--seed", help="seed for the courses and the NEAT mutations while training",
+                        type=int)
+    parser.add_argument("--resume", help="carry on training from a checkpoint file, reusing its seed")
+    parser.add_argument("--checkpoint-every", help="generations between training checkpoints",
+                        type=int, default=100)
+    parser.add_argument("--checkpoint-seconds", help="seconds after which a checkpoint is saved anyway, 0 disables it",
+                        type=float, default=300)
+    parser.add_argument("--fixed-course", help="play the same course every generation while training",
+                        action="store_true")
+    parser.add_argument("--cache-size", help="genomes kept in the fitness cache with --fixed-course, 0 disables it",
+                        type=int, default=10000)
+    parser.add_argument("--max-frames", help="frames a training game lasts at most", type=int)
+    parser.add_argument("--max-pipes", help="pipes a training game lasts at most", type=int)
+    parser.add_argument("--prune", help="with --max-frames, stop playing birds that can't catch up with the leader; "
+                        "fitness then depends on the genomes played in the same batch, and isn't cached",
+                        action="store_true")
+    parser.add_argument("--no-plots", help="skip drawing the network and the statistics after training",
+                        action="store_true")
+    parser.add_argument("--telemetry", help="file the statistics of every training generation are appended to",
+                        default="telemetry.jsonl")
+    parser.add_argument("--watch", metavar="TELEMETRY", help="keep redrawing the plots of a training telemetry file")
+    parser.add_argument("--watch-interval", help="seconds between two looks at the watched file",
+                        type=float, default=10.0)
+    parser.add_argument("--show", metavar="K", help="watch the training games, drawing the K fittest live birds",
+                        type=int)
+    parser.add_argument("--speed", help="game speed when watching the ai or the training, changed with up/down",
+                        type=float, default=1.0)
+    parser.add_argument("--skip", help="steps played without drawing when s is pressed while watching",
+                        type=int, default=600)
+    parser.add_argument("--islands", help="train this many populations in parallel, trading their best genomes",
+                        type=int)
+    parser.add_argument("--island", metavar="INDEX", help="train one island of a ring spread over several machines",
+                        type=int)
+    parser.add_argument("--listen", metavar="HOST:PORT", help="address this --island receives migrants on")
+    parser.add_argument("--next", metavar="HOST:PORT", help="address of the island that gets the migrants of --island")
+    parser.add_argument("--migration-interval", help="generations between two migrations of the islands",
+                        type=int, default=10)
+    parser.add_argument("--migrants", help="best genomes an island sends at each migration", type=int, default=2)
+    parser.add_argument("--resume-islands", help="carry on every island from its newest checkpoint",
+                        action="store_true")
+    parser.add_argument("--chunk-size", help="genomes handed to a worker at a time, workers pick up the next "
+                        "chunk as soon as they are free", type=int)
+    parser.add_argument("--eval-timeout", help="seconds after which unfinished training games are given up",
+                        type=float)
+    parser.add_argument("--steady-state", metavar="EVALUATIONS", type=int,
+                        help="train without generations, replacing the worst genome as each game ends")
+    parser.add_argument("--episodes", metavar="DIR", help="record the game of the best genome of every "
+                        "training generation in DIR")
+    parser.add_argument("--reports", metavar="DIR", help="draw the best network and the statistics into DIR "
+                        "while training, in a background process")
+    parser.add_argument("--report-every", help="generations between two reports, the checkpoint interval by default",
+                        type=int)
+    parser.add_argument("--report-formats", help="files of each report: png, svg and/or json", nargs="+",
+                        choices=["png", "svg", "json"], default=["png", "json"])
+    parser.add_argument("--replay", metavar="EPISODE", help="play back a recorded episode file")
+    parser.add_argument("--start", help="frame the replay starts from", type=int, default=0)
+    parser.add_argument("--tournament", metavar="MODEL", nargs="+",
+                        help="play pickled genomes such as model against each other on the same courses")
+    parser.add_argument("--courses", help="courses of the tournament, derived from --seed", type=int, default=32)
+    parser.add_argument("--tournament-output", metavar="JSON", help="file the tournament results go to")
+    parser.add_argument("--min-score", help="exit with status 1 when a tournament model's mean score is lower",
+                        type=float)
+    parser.add_argument("--timings", help="print where the time of the game loop goes", action="store_true")
+    parser.add_argument("--profile-generation", help="run cProfile over this training generation", type=int)
+    parser.add_argument("--gap-collision", help="use the analytic gap test instead of pixel perfect collision",
+                        action="store_true")
 
     # Read arguments from the command line
     args = parser.parse_args()
-
-    if args.train:
-        train()
+    if args.island is not None and not (args.listen and args.next):
+        parser.error("--island needs --listen and --next")
+    if args.prune and args.max_frames is None:
+        parser.error("--prune needs --max-frames")
+
+    timer = profiling.PhaseTimer() if args.timings else None
+
+    options = dict(workers=args.workers, checkpoint_every=args.checkpoint_every,
+                   checkpoint_seconds=args.checkpoint_seconds, fixed_course=args.fixed_course,
+                   cache_size=args.cache_size, max_frames=args.max_frames, max_pipes=args.max_pipes,
+                   prune=args.prune, timings=args.timings, chunk_size=args.chunk_size,
+                   eval_timeout=args.eval_timeout, episodes=args.episodes, reports=args.reports,
+                   report_every=args.report_every, report_formats=args.report_formats,
+                   pixel_perfect=not args.gap_collision)
+
+    if args.steady_state:
+        train_steady(args.steady_state, args.workers, args.seed, args.eval_timeout, args.max_frames,
+                     args.max_pipes, args.prune, not args.gap_collision)
+    elif args.islands:
+        train_islands(args.islands, args.seed, args.resume_islands, args.migration_interval, args.migrants,
+                      **options)
+    elif args.island is not None:
+        import islands
+
+        def address(text):
+            host, port = text.rsplit(":", 1)
+            return host, int(port)
+
+        transport = islands.SocketTransport(address(args.listen), address(args.next))
+        island = islands.Island(args.island, transport, args.migration_interval, args.migrants)
+        resume = islands.latest_checkpoint(args.island) if args.resume_islands else None
+        train(seed=args.seed, resume=resume, island=island, plots=not args.no_plots,
+              telemetry=island.prefix + "telemetry.jsonl", **options)
+    elif args.train:
+        train(seed=args.seed, resume=args.resume, profile_generation=args.profile_generation,
+              plots=not args.no_plots, telemetry=args.telemetry, show=args.show, speed=args.speed, skip=args.skip,
+              **options)
+    elif args.tournament:
+        if not run_tournament(args.tournament, args.courses, args.seed, args.workers, args.max_frames,
+                              args.tournament_output, args.min_score, not args.gap_collision):
+            raise SystemExit(1)
+    elif args.replay:
+        replay(args.replay, args.start, args.speed, args.skip)
     elif args.ai:
-        ai_play()
+        ai_play(args.model, timer, args.speed, args.skip, not args.gap_collision)
     elif args.human:
-        human_play()
\ No newline at end of file
+        human_play(timer, not args.gap_collision)
+    elif args.bench:
+        benchmark(args.bench_sizes, args.bench_output)
+    elif args.export:
+        export_model(args.export)
+    elif args.watch:
+        import visualize
+
+        visualize.watch(args.watch, args.watch_interval, PLOT_POINTS)
\ No newline at end of file
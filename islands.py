@@ -0,0 +1,220 @@
+"""
+Island model training: several populations evolving side by side.
+
+Every island is a whole training run with its own seed, checkpoints and
+telemetry. Every few generations an island sends copies of its best genomes
+to the next island of the ring, which swaps them in for its newest
+offspring. The genomes travel in the checkpoint encoding, over a
+multiprocessing queue for islands on one machine or over TCP for islands on
+several machines.
+"""
+import glob
+import io
+import multiprocessing
+import os
+import queue
+import re
+import socket
+import struct
+import threading
+from itertools import count
+from multiprocessing.connection import wait
+
+import numpy as np
+from neat.reporting import BaseReporter
+
+import checkpoint
+
+
+def encode_migrants(genomes):
+    """ Packs genomes into bytes, without pickling them. """
+    buffer = io.BytesIO()
+    np.savez(buffer, **checkpoint.encode_genomes(genomes))
+    return buffer.getvalue()
+
+
+def decode_migrants(data, config):
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        return checkpoint.decode_genomes(dict((k, arrays[k]) for k in arrays.files), config)
+
+
+def latest_checkpoint(index, directory='.'):
+    """ Newest checkpoint written by island index in directory, or None. """
+    found = []
+    for filename in glob.glob(os.path.join(directory, 'island-{0}-checkpoint-*.npz'.format(index))):
+        match = re.search(r'-(\d+)\.npz$', filename)
+        if match:
+            found.append((int(match.group(1)), os.path.normpath(filename)))
+    return max(found)[1] if found else None
+
+
+def _drain(inbox):
+    """ Returns every message waiting in inbox, without blocking. """
+    messages = []
+    while True:
+        try:
+            messages.append(inbox.get_nowait())
+        except queue.Empty:
+            return messages
+
+
+def join_islands(processes, transports, interval=1.0):
+    """
+    Waits for the island processes, each with its QueueTransport. A process
+    can't exit before the migrants it sent are read, so the inbox of every
+    island that no longer reads it is emptied here until all have exited.
+    """
+    running = list(processes)
+    while running:
+        wait([process.sentinel for process in running], timeout=interval)
+        running = [process for process in running if process.is_alive()]
+        for process, transport in zip(processes, transports):
+            if transport.closed.is_set() or process not in running:
+                _drain(transport.inbox)
+    for process in processes:
+        process.join()
+
+
+class QueueTransport:
+    """
+    Migration between processes of one machine, reading from inbox and writing
+    to outbox. closed is set once the island stops reading, see join_islands.
+    """
+
+    def __init__(self, inbox, outbox):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.closed = multiprocessing.Event()
+
+    def send(self, data):
+        self.outbox.put(data)
+
+    def receive(self):
+        """ Returns every message that has arrived, without waiting. """
+        return _drain(self.inbox)
+
+    def close(self):
+        self.closed.set()
+
+
+class SocketTransport:
+    """
+    Migration over TCP. Messages sent here are accepted on listen, a (host, port)
+    pair, by a background thread, and send() writes to the island at
+    next_address. Each message is prefixed with its length. Migrants for an
+    island that can't be reached are dropped, it gets the next ones.
+    """
+    HEADER = struct.Struct('<Q')
+
+    def __init__(self, listen, next_address, timeout=5.0):
+        self.next_address = next_address
+        self.timeout = timeout
+        self.inbox = queue.Queue()
+        self.connection = None
+        self.server = socket.create_server(listen)
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._read, args=(connection,), daemon=True).start()
+
+    def _read(self, connection):
+        with connection, connection.makefile('rb') as stream:
+            while True:
+                header = stream.read(self.HEADER.size)
+                if len(header) < self.HEADER.size:
+                    return
+                length = self.HEADER.unpack(header)[0]
+                data = stream.read(length)
+                # a sender that died halfway leaves a message that can't be decoded
+                if len(data) != length:
+                    return
+                self.inbox.put(data)
+
+    def send(self, data):
+        try:
+            if self.connection is None:
+                self.connection = socket.create_connection(self.next_address, timeout=self.timeout)
+            self.connection.sendall(self.HEADER.pack(len(data)) + data)
+        except OSError as e:
+            print("Island at {0}:{1} unreachable, migrants dropped ({2})".format(*self.next_address, e))
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+
+    def receive(self):
+        return _drain(self.inbox)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+        self.server.close()
+
+
+class Island:
+    """ Where a training run sits in the ring: its index, its transport and how it migrates. """
+
+    def __init__(self, index, transport, interval=10, migrants=2):
+        self.index = index
+        self.transport = transport
+        self.interval = interval
+        self.migrants = migrants
+
+    @property
+    def prefix(self):
+        """ Start of the name of every file the island writes. """
+        return 'island-{0}-'.format(self.index)
+
+
+class Migration(BaseReporter):
+    """
+    Sends the migrants best genomes of the population to the next island every
+    interval generations, and puts the genomes that arrived in place of the
+    newest offspring at the end of each generation. Arrivals are picked up
+    whenever they come, so islands never wait for each other.
+    """
+
+    def __init__(self, population, island):
+        self.population = population
+        self.island = island
+        self.generation = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.generation % self.island.interval:
+            return
+        best = sorted(population.values(), key=lambda g: g.fitness, reverse=True)[:self.island.migrants]
+        self.island.transport.send(encode_migrants(best))
+
+    def end_generation(self, config, population, species_set):
+        arrivals = [g for data in self.island.transport.receive() for g in decode_migrants(data, config)]
+        arrivals = arrivals[:len(population)]
+        if not arrivals:
+            return
+
+        # the elites come first in the population, the newest offspring last
+        for key in list(population)[-len(arrivals):]:
+            del population[key]
+
+        reproduction = self.population.reproduction
+        genome_config = config.genome_config
+        for genome in arrivals:
+            genome.key = next(reproduction.genome_indexer)
+            genome.fitness = None
+            population[genome.key] = genome
+            reproduction.ancestors[genome.key] = tuple()
+
+        # hidden node keys of other islands must not be handed out again here
+        next_node = max(n for g in population.values() for n in g.nodes) + 1
+        if genome_config.node_indexer is not None:
+            next_node = max(next_node, next(genome_config.node_indexer))
+        genome_config.node_indexer = count(next_node)
+
+        species_set.speciate(config, population, self.population.generation)
+        print("Island {0}: {1} migrants arrived".format(self.island.index, len(arrivals)))
@@ -0,0 +1,155 @@
+"""
+Parallel fitness evaluation for the headless game.
+
+Works like neat.ParallelEvaluator, except that a generation is split into
+shards of genomes and every shard plays the same course, so the fitness values
+stay comparable across shards. With a single worker everything runs in this
+process.
+"""
+import functools
+import queue
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import profiling
+
+# ways of turning the fitness of a genome on each course into its fitness
+AGGREGATIONS = {
+    'mean': np.mean,
+    'min': np.min,
+    'median': np.median,
+    'mean-stdev': lambda fitness: np.mean(fitness) - np.std(fitness),
+}
+
+
+def assign_fitness(genome, course_fitness, config):
+    """ Sets the fitness of genome from its fitness on every course, keeping those as genome.course_fitness. """
+    genome.course_fitness = tuple(float(f) for f in course_fitness)
+    genome.fitness = float(AGGREGATIONS[config.fitness_aggregation](course_fitness))
+
+
+def _run_shard(simulate, genomes, config, seed, timed, recorded=False):
+    """
+    Plays one shard in a worker, returning its fitness values, its phase times
+    if timed and, if recorded, the episodes.Actions of its first course.
+    """
+    options = {}
+    if timed:
+        options['timer'] = profiling.PhaseTimer()
+    if recorded:
+        import episodes
+
+        options['actions'] = episodes.Actions()
+    fitness = simulate(genomes, config, seed, **options)
+    phases = None
+    if timed:
+        phases = (dict(options['timer'].totals), dict(options['timer'].counts))
+    return fitness, phases, options.get('actions')
+
+
+class ParallelEvaluator:
+    def __init__(self, num_workers, simulate, seeds, timeout=None, timer=None, chunk_size=None, recorded=False):
+        """
+        simulate(genomes, config, seed) plays the genomes on the courses derived
+        from seed and returns a row of fitness values per course for every
+        genome, in order. seeds.current is the course seed of the generation
+        being evaluated. If a profiling.PhaseTimer is given as timer, simulate
+        also gets a timer keyword and the phase times of every shard are added
+        to it.
+
+        With chunk_size the generation is cut into shards of that many genomes
+        instead of one shard per worker, and a worker takes the next shard as
+        soon as it is done with one, so a long game only holds up its own shard.
+        Shards are collected in the order they finish. Genomes whose shard
+        isn't back timeout seconds after the generation started get the lowest
+        fitness of the generation, and the pool is restarted to get rid of the
+        stuck games. Their ids are kept in timed_out until the next evaluate().
+
+        With recorded, simulate also gets an episodes.Actions as actions, and
+        until the next evaluate() actions maps the key of every genome played
+        to the Actions of its shard and the genome's place in it.
+        """
+        self.num_workers = num_workers
+        self.simulate = simulate
+        self.seeds = seeds
+        self.timeout = timeout
+        self.timer = timer
+        self.chunk_size = chunk_size
+        self.pool = Pool(num_workers) if num_workers > 1 else None
+        self.recorded = recorded
+        self.timed_out = set()
+        self.actions = {}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def evaluate(self, genomes, config):
+        seed = self.seeds.current
+        self.timed_out = set()
+        self.actions = {}
+        if self.pool is None:
+            options = {}
+            if self.timer is not None:
+                options['timer'] = self.timer
+            if self.recorded:
+                import episodes
+
+                options['actions'] = episodes.Actions()
+            fitness = self.simulate([g for _, g in genomes], config, seed, **options)
+            for bird, ((_, g), f) in enumerate(zip(genomes, fitness)):
+                assign_fitness(g, f, config)
+                if self.recorded:
+                    self.actions[g.key] = (options['actions'], bird)
+            return
+
+        if self.chunk_size is None:
+            shards = np.array_split(np.arange(len(genomes)), self.num_workers)
+        else:
+            shards = np.array_split(np.arange(len(genomes)), range(self.chunk_size, len(genomes), self.chunk_size))
+        shards = [shard for shard in shards if len(shard)]
+
+        finished = queue.Queue()
+        for n, shard in enumerate(shards):
+            members = [genomes[i][1] for i in shard]
+            self.pool.apply_async(_run_shard, (self.simulate, members, config, seed, self.timer is not None,
+                                               self.recorded),
+                                  callback=functools.partial(_put, finished, n),
+                                  error_callback=functools.partial(_put, finished, n))
+
+        # assign the fitness back to each genome, in the order the shards finish
+        pending = set(range(len(shards)))
+        deadline = None if self.timeout is None else time.time() + self.timeout
+        while pending:
+            try:
+                n, result = finished.get(timeout=None if deadline is None else max(deadline - time.time(), 0))
+            except queue.Empty:
+                break
+            if isinstance(result, BaseException):
+                raise result
+            pending.discard(n)
+            shard_fitness, phases, actions = result
+            for bird, (i, fitness) in enumerate(zip(shards[n], shard_fitness)):
+                assign_fitness(genomes[i][1], fitness, config)
+                if actions is not None:
+                    self.actions[genomes[i][1].key] = (actions, bird)
+            if phases is not None:
+                self.timer.merge(*phases)
+
+        if pending:
+            late = [genomes[i][1] for n in pending for i in shards[n]]
+            self.timed_out = set(genomes[i][0] for n in pending for i in shards[n])
+            lowest = min([genomes[i][1].fitness for n in range(len(shards)) if n not in pending for i in shards[n]],
+                         default=0.0)
+            print("{0} genomes timed out after {1} sec".format(len(late), self.timeout))
+            for g in late:
+                assign_fitness(g, [lowest] * config.courses, config)
+            self.pool.terminate()
+            self.pool = Pool(self.num_workers)
+
+
+def _put(results, n, result):
+    results.put((n, result))
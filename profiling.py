@@ -0,0 +1,56 @@
+"""
+Low overhead timers for the phases of the game loop.
+
+The loops call timer.lap(phase) at the end of every phase, which charges the
+time since the previous lap to that phase. NULL_TIMER does nothing, so the
+loops can always call it.
+"""
+from collections import defaultdict
+from time import perf_counter
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.last = perf_counter()
+
+    def start(self):
+        """ Starts timing from now, whatever ran since the last lap is not charged. """
+        self.last = perf_counter()
+
+    def lap(self, phase):
+        now = perf_counter()
+        self.totals[phase] += now - self.last
+        self.counts[phase] += 1
+        self.last = now
+
+    def merge(self, totals, counts):
+        """ Adds the totals and counts of another timer, e.g. one from a worker process. """
+        for phase, seconds in totals.items():
+            self.totals[phase] += seconds
+        for phase, n in counts.items():
+            self.counts[phase] += n
+
+    def clear(self):
+        self.totals.clear()
+        self.counts.clear()
+
+    def summary(self):
+        total = sum(self.totals.values())
+        parts = []
+        for phase, seconds in sorted(self.totals.items(), key=lambda item: -item[1]):
+            share = 100 * seconds / total if total else 0
+            parts.append("{0} {1:.3f}s ({2:.0f}%)".format(phase, seconds, share))
+        return ", ".join(parts)
+
+
+class _NullTimer:
+    def start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+
+NULL_TIMER = _NullTimer()
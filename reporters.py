@@ -0,0 +1,170 @@
+"""
+NEAT reporters used while training.
+"""
+import cProfile
+import json
+import pstats
+import time
+
+import numpy as np
+from neat.reporting import BaseReporter
+
+
+class WorldSeeds(BaseReporter):
+    """
+    Hands out the course seed of every generation, derived from the seed of the run.
+    Every evaluator of a generation reads the same seed, and it is printed so a
+    course can be replayed later. With fixed set, every generation plays the
+    course of generation 0.
+    """
+
+    def __init__(self, run_seed, fixed=False):
+        self.run_seed = run_seed
+        self.fixed = fixed
+        self.generation = 0
+
+    @property
+    def current(self):
+        """ Course seed of the generation being evaluated. """
+        return self.seed_for(0 if self.fixed else self.generation)
+
+    def seed_for(self, generation):
+        return int(np.random.SeedSequence([self.run_seed, generation]).generate_state(1)[0])
+
+    def start_generation(self, generation):
+        self.generation = generation
+        print("World seed: {0}".format(self.current))
+
+
+class TimingReporter(BaseReporter):
+    """
+    Prints how the evaluation time of every generation splits across the phases
+    of the game loop, as recorded by a profiling.PhaseTimer. With several
+    workers the phases add up the time of every worker.
+    """
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.generation_start = None
+
+    def start_generation(self, generation):
+        self.timer.clear()
+        self.generation_start = time.time()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        print("Evaluation time: {0:.3f} sec".format(time.time() - self.generation_start))
+        print("Phase times: " + self.timer.summary())
+
+
+class ProfileReporter(BaseReporter):
+    """
+    Runs cProfile over the evaluation of one generation, then prints the most
+    expensive calls and saves the full stats to filename. Only calls made in
+    this process are seen, so it is most useful with a single worker.
+    """
+
+    def __init__(self, generation, filename='profile.prof', limit=25):
+        self.generation = generation
+        self.filename = filename
+        self.limit = limit
+        self.profiler = None
+
+    def start_generation(self, generation):
+        if generation == self.generation:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        self.profiler.dump_stats(self.filename)
+        print("Profile of generation {0} saved to {1}".format(self.generation, self.filename))
+        pstats.Stats(self.profiler).sort_stats('cumulative').print_stats(self.limit)
+        self.profiler = None
+
+
+def course_spread(population):
+    """ Standard deviation of the fitness of every genome across the courses it played. """
+    return np.array([np.std(g.course_fitness) for g in population.values()])
+
+
+class CourseFitnessReporter(BaseReporter):
+    """
+    Prints how much the fitness of the genomes varies from one course to the
+    next: the fitness of the best genome on each course, and the mean and
+    largest standard deviation of a genome across its courses. A winner that
+    only does well on some of the courses shows up here before it's shipped.
+    """
+
+    def post_evaluate(self, config, population, species, best_genome):
+        spread = course_spread(population)
+        print("Best genome on each course: " + ", ".join("{0:.1f}".format(f) for f in best_genome.course_fitness))
+        print("Fitness stdev across courses: {0:.3f} mean, {1:.3f} max".format(spread.mean(), spread.max()))
+
+
+class TelemetryReporter(BaseReporter):
+    """
+    Appends one JSON line per generation to filename: the best, mean and stdev
+    of the fitness, the mean stdev of a genome across its courses, the fitness
+    of the best genome on every course, the size of every species and the
+    time the generation took, plus the phase times of timer if one is given.
+    Each line is written and flushed as soon as the generation is evaluated
+    and nothing is kept in memory, so the file can be plotted while the run
+    goes on. Unless append is set the file is emptied first.
+    """
+
+    def __init__(self, filename='telemetry.jsonl', timer=None, append=False):
+        self.filename = filename
+        self.timer = timer
+        self.generation = 0
+        self.generation_start = None
+        if not append:
+            open(filename, 'w').close()
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.generation_start = time.time()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitness = np.array([g.fitness for g in population.values()], dtype=float)
+        record = {
+            'generation': self.generation,
+            'best': best_genome.fitness,
+            'mean': float(fitness.mean()),
+            'stdev': float(fitness.std()),
+            'population': len(fitness),
+            'species': dict((str(sid), len(s.members)) for sid, s in species.species.items()),
+            'seconds': time.time() - self.generation_start,
+            'course_stdev': float(course_spread(population).mean()),
+            'best_courses': list(best_genome.course_fitness),
+        }
+        if self.timer is not None:
+            record['phases'] = dict(self.timer.totals)
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+class VisualReporter(BaseReporter):
+    """
+    Hands the best genome of every interval-th generation to a
+    visualize.ReportWorker, which draws the report in the background. A
+    report that would have to wait for the worker is skipped instead.
+    """
+
+    def __init__(self, worker, interval=100):
+        self.worker = worker
+        self.interval = interval
+        self.generation = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.generation % self.interval:
+            return
+        if not self.worker.alive:
+            print("Visual report of generation {0} skipped, the report worker has stopped".format(self.generation))
+        elif not self.worker.submit(self.generation, best_genome):
+            print("Visual report of generation {0} skipped, the previous ones are still being drawn".format(
+                self.generation))
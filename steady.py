@@ -0,0 +1,154 @@
+"""
+Steady-state evolution, without generations.
+
+Instead of waiting for a whole generation to finish, every worker is handed
+a new child as soon as it has scored the previous one. A finished child
+takes the place of the worst genome of the population if it beats it, and
+the parents of the next children are picked by tournament among the current
+population. All games play the same courses, so fitness values stay
+comparable for the whole run.
+"""
+import functools
+import queue
+import random
+import time
+from itertools import count
+from multiprocessing import Pool
+
+import parallel
+
+
+class SteadyState:
+    """
+    Evolves config.pop_size genomes with num_workers processes, each kept busy
+    with in_flight games. simulate is the same function the ParallelEvaluator
+    gets. A game not back after timeout seconds is dropped and the pool is
+    restarted, the other games in flight are handed out again.
+    """
+
+    def __init__(self, config, simulate, seed, num_workers=1, timeout=None, tournament=3, in_flight=2):
+        self.config = config
+        self.simulate = simulate
+        self.seed = seed
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.tournament = tournament
+        self.in_flight = in_flight
+        self.indexer = count(1)
+        self.population = []
+        self.evaluations = 0
+        self.best_genome = None
+
+        self.pool = Pool(num_workers)
+        self.finished = queue.Queue()
+        self.running = {}           #genomes being played by key, with the time they were handed out
+
+    def new_genome(self):
+        genome = self.config.genome_type(next(self.indexer))
+        genome.configure_new(self.config.genome_config)
+        return genome
+
+    def child(self):
+        """ Crosses over two tournament winners and mutates the result. """
+        parent1, parent2 = (max(random.sample(self.population, min(self.tournament, len(self.population))),
+                                key=lambda g: g.fitness) for _ in range(2))
+        if parent1.fitness < parent2.fitness:
+            parent1, parent2 = parent2, parent1
+        genome = self.config.genome_type(next(self.indexer))
+        genome.configure_crossover(parent1, parent2, self.config.genome_config)
+        genome.mutate(self.config.genome_config)
+        return genome
+
+    def submit(self, genome):
+        self.running[genome.key] = (genome, time.time())
+        self.pool.apply_async(parallel._run_shard, (self.simulate, [genome], self.config, self.seed, False),
+                              callback=functools.partial(self._put, genome.key),
+                              error_callback=functools.partial(self._put, genome.key))
+
+    def _put(self, key, result):
+        self.finished.put((key, result))
+
+    def add(self, genome):
+        """ Puts a scored genome in the population, in place of the worst one once it is full. """
+        if self.best_genome is None or genome.fitness > self.best_genome.fitness:
+            self.best_genome = genome
+        if len(self.population) < self.config.pop_size:
+            self.population.append(genome)
+            return
+        worst = min(range(len(self.population)), key=lambda i: self.population[i].fitness)
+        if genome.fitness > self.population[worst].fitness:
+            self.population[worst] = genome
+
+    def restart(self):
+        """ Replaces a pool with a stuck game, handing the other running games out again. """
+        self.pool.terminate()
+        self.pool = Pool(self.num_workers)
+        self.finished = queue.Queue()
+        running, self.running = self.running, {}
+        for genome, _ in running.values():
+            self.submit(genome)
+
+    def late(self):
+        """ Keys of the running games handed out more than timeout seconds ago. """
+        if self.timeout is None:
+            return []
+        now = time.time()
+        return [k for k, (_, start) in self.running.items() if now - start > self.timeout]
+
+    def time_left(self):
+        """ Seconds until the first running game times out, None without a timeout. """
+        if self.timeout is None or not self.running:
+            return None
+        first = min(start for _, start in self.running.values())
+        return max(first + self.timeout - time.time(), 0)
+
+    def run(self, evaluations, report_every=None):
+        """ Scores evaluations genomes in all, then returns the best one seen. """
+        report_every = report_every or self.config.pop_size
+        # the initial population fills the pool, the children keep it full
+        submitted = 0
+        for _ in range(self.config.pop_size):
+            self.submit(self.new_genome())
+            submitted += 1
+
+        try:
+            while self.evaluations < evaluations:
+                while submitted < evaluations and len(self.running) < self.num_workers * self.in_flight:
+                    self.submit(self.new_genome() if len(self.population) < 2 else self.child())
+                    submitted += 1
+
+                # looked at on every result, a stuck game must not wait for the others to run out
+                late = self.late()
+                if late:
+                    print("{0} games timed out after {1} sec".format(len(late), self.timeout))
+                    for k in late:
+                        del self.running[k]
+                    submitted -= len(late)
+                    self.restart()
+                    continue
+
+                try:
+                    key, result = self.finished.get(timeout=self.time_left())
+                except queue.Empty:
+                    continue
+                if key not in self.running:
+                    # a game handed out again after a restart
+                    continue
+                if isinstance(result, BaseException):
+                    raise result
+
+                genome, _ = self.running.pop(key)
+                fitness = result[0]
+                parallel.assign_fitness(genome, fitness[0], self.config)
+                self.add(genome)
+                self.evaluations += 1
+                if self.evaluations % report_every == 0:
+                    self.report()
+        finally:
+            self.pool.terminate()
+        return self.best_genome
+
+    def report(self):
+        fitness = [g.fitness for g in self.population]
+        print("Evaluations: {0}, best fitness {1:.3f}, population mean {2:.3f}, {3} games running".format(
+            self.evaluations, self.best_genome.fitness, sum(fitness) / len(fitness), len(self.running)))
@@ -0,0 +1,37 @@
+"""
+A run resumed from a checkpoint must carry on exactly like the run that
+wrote it.
+"""
+import random
+
+import neat
+import pytest
+
+import checkpoint
+import flappy_bird
+
+
+def fitness(genomes, config):
+    for _, g in genomes:
+        g.fitness = sum(c.weight for c in g.connections.values() if c.enabled) + 0.01 * len(g.nodes)
+
+
+def snapshot(p):
+    genomes = sorted((k, sorted((c.key, c.weight, c.enabled) for c in g.connections.values()),
+                      sorted((n.key, n.bias, n.response, n.activation) for n in g.nodes.values()))
+                     for k, g in p.population.items())
+    species = [(sid, s.representative.key, list(s.members)) for sid, s in p.species.species.items()]
+    return genomes, species
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_resume_reproduces_run(tmp_path, seed):
+    random.seed(seed)
+    p = neat.Population(flappy_bird.load_config())
+    p.add_reporter(checkpoint.Checkpointer(p, 15, None, filename_prefix=str(tmp_path / "checkpoint-")))
+    p.run(fitness, 40)
+
+    resumed, _ = checkpoint.restore_checkpoint(str(tmp_path / "checkpoint-14.npz"), flappy_bird.load_config())
+    resumed.run(fitness, 25)
+    assert resumed.generation == p.generation
+    assert snapshot(resumed) == snapshot(p)
@@ -0,0 +1,70 @@
+"""
+VectorSpeciesSet must place genomes exactly like neat.DefaultSpeciesSet and
+log the same distance statistics, generation after generation. The
+distances the statistics are taken over are compared too, bit for bit and
+in order, since the logged ones are rounded.
+"""
+import random
+
+import neat
+import pytest
+from neat.reporting import BaseReporter
+
+import flappy_bird
+import speciation
+from neat import math_util
+
+
+def fitness(genomes, config):
+    """ Cheap, deterministic stand-in for a game. """
+    for _, g in genomes:
+        g.fitness = sum(c.weight for c in g.connections.values() if c.enabled) + 0.01 * len(g.nodes)
+
+
+class Log(BaseReporter):
+    """ Keeps the species of every generation and every info message. """
+
+    def __init__(self):
+        self.species = []
+        self.messages = []
+
+    def end_generation(self, config, population, species_set):
+        self.species.append([(sid, s.representative.key, list(s.members)) for sid, s in species_set.species.items()])
+
+    def info(self, msg):
+        self.messages.append(msg)
+
+
+def recorded_mean(distances):
+    """ neat's mean, keeping every list of distances it is given. """
+    def mean(values):
+        values = list(values)
+        distances.append(values)
+        return math_util.mean(values)
+    return mean
+
+
+def evolve(species_set_type, pop_size, generations, seed):
+    config = flappy_bird.load_config()
+    config.pop_size = pop_size
+    config.species_set_type = species_set_type
+    random.seed(seed)
+    p = neat.Population(config)
+    log = Log()
+    p.add_reporter(log)
+    p.run(fitness, generations)
+    return log
+
+
+@pytest.mark.parametrize("pop_size, generations", [(150, 15), (400, 3)])
+def test_vectorized_matches_default(monkeypatch, pop_size, generations):
+    default_distances, vectorized_distances = [], []
+    monkeypatch.setattr(neat.species, "mean", recorded_mean(default_distances))
+    monkeypatch.setattr(speciation, "mean", recorded_mean(vectorized_distances))
+
+    default = evolve(neat.DefaultSpeciesSet, pop_size, generations, 3)
+    vectorized = evolve(speciation.VectorSpeciesSet, pop_size, generations, 3)
+    assert len(default.species) == generations
+    assert vectorized.species == default.species
+    assert vectorized.messages == default.messages
+    assert vectorized_distances == default_distances
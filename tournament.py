@@ -0,0 +1,142 @@
+"""
+Headless tournaments between saved models.
+
+Every model plays the same seeded courses, all the models of a course in one
+flock, with the courses spread over a process pool. The games of a model are
+summed up by the pipes it passed, the frames it survived and the courses it
+played to the end, and the results are printed as a table or written as JSON,
+so a new model can be checked against the deployed one from a script.
+"""
+import copy
+import json
+import pickle
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import engine
+
+#frames a tournament game lasts at most, about a hundred pipes
+MAX_FRAMES = 10000
+
+
+class Survival:
+    """
+    Follows the birds of a game as its render callback: the frames every bird
+    stayed alive and the pipes it had passed by then.
+    """
+
+    def __init__(self, size):
+        self.frames = np.zeros(size, dtype=int)
+        self.score = np.zeros(size, dtype=int)
+
+    def __call__(self, flock, pipes, base, score):
+        alive = flock.alive
+        self.frames[alive] += 1
+        self.score[alive] = score
+
+
+def load_models(paths):
+    """ Reads pickled genomes, such as model, by file name. """
+    models = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            models[path] = pickle.load(f)
+    return models
+
+
+def _play(simulate, genomes, config, seed, max_frames):
+    """ Plays one course in a worker, returning what every bird did and the frames played. """
+    survival = Survival(len(genomes))
+    info = {}
+    simulate(genomes, config, seed, max_frames=max_frames, info=info, render=survival)
+    return survival.frames, survival.score, info['frames']
+
+
+def _summary(values):
+    return {
+        'mean': float(np.mean(values)),
+        'stdev': float(np.std(values)),
+        'min': int(np.min(values)),
+        'p10': float(np.percentile(values, 10)),
+        'median': float(np.median(values)),
+        'max': int(np.max(values)),
+    }
+
+
+def run(simulate, models, config, seed=0, courses=32, workers=1, max_frames=MAX_FRAMES):
+    """
+    Plays every genome of the models dict, by name, on courses courses derived
+    from seed and returns the report, models ranked by their mean score.
+    The courses are played without warmup pipes, like the games in the window.
+    """
+    names = list(models)
+    genomes = [models[name] for name in names]
+    single = copy.copy(config)
+    single.courses = 1
+    single.course_warmup = 0
+    seeds = engine.course_seeds(seed, courses)
+    tasks = [(simulate, genomes, single, s, max_frames) for s in seeds]
+
+    start = time.perf_counter()
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = pool.starmap(_play, tasks)
+    else:
+        results = [_play(*task) for task in tasks]
+    elapsed = time.perf_counter() - start
+
+    #(models, courses) arrays
+    frames = np.array([r[0] for r in results]).T
+    score = np.array([r[1] for r in results]).T
+    rows = []
+    for i, name in enumerate(names):
+        rows.append({
+            'model': name,
+            'score': _summary(score[i]),
+            'frames': _summary(frames[i]),
+            'finished': int(np.sum(frames[i] >= max_frames)),
+            'course_scores': score[i].tolist(),
+        })
+    rows.sort(key=lambda row: (row['score']['mean'], row['frames']['mean']), reverse=True)
+
+    game_frames = sum(r[2] for r in results)
+    return {
+        'seed': seed,
+        'courses': courses,
+        'max_frames': max_frames,
+        'workers': workers,
+        'seconds': elapsed,
+        'throughput': {
+            'courses_per_sec': courses / elapsed,
+            'frames_per_sec': game_frames / elapsed,
+            'bird_frames_per_sec': int(frames.sum()) / elapsed,
+        },
+        'models': rows,
+    }
+
+
+def format_table(report):
+    """ The report as a text table, best model first. """
+    lines = ["{0} courses from seed {1}, at most {2} frames each".format(
+        report['courses'], report['seed'], report['max_frames'])]
+    width = max([len(row['model']) for row in report['models']] + [5])
+    lines.append("{0:{w}s} {1:>8s} {2:>7s} {3:>5s} {4:>7s} {5:>7s} {6:>5s} {7:>9s} {8:>9s}".format(
+        "model", "score", "stdev", "min", "median", "max", "p10", "frames", "finished", w=width))
+    for row in report['models']:
+        score = row['score']
+        finished = "{0}/{1}".format(row['finished'], report['courses'])
+        lines.append("{0:{w}s} {1:8.2f} {2:7.2f} {3:5d} {4:7.1f} {5:7d} {6:5.1f} {7:9.1f} {8:>9s}".format(
+            row['model'], score['mean'], score['stdev'], score['min'], score['median'], score['max'],
+            score['p10'], row['frames']['mean'], finished, w=width))
+    throughput = report['throughput']
+    lines.append("{0:.1f} sec with {1} workers: {2:.1f} courses/sec, {3:.0f} frames/sec, {4:.0f} bird frames/sec".format(
+        report['seconds'], report['workers'], throughput['courses_per_sec'], throughput['frames_per_sec'],
+        throughput['bird_frames_per_sec']))
+    return "\n".join(lines)
+
+
+def save(report, filename):
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2)
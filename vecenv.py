@@ -0,0 +1,195 @@
+"""
+Batched, headless environment for driving Flappy Bird from outside the game loops.
+
+FlappyVecEnv runs N independent worlds in lockstep with the rules of engine.Bird,
+engine.Pipe and the play loop, storing every world in numpy arrays. The
+interface follows gym's vectorized environments: reset(seeds) and
+step(actions), with observation arrays holding the same four inputs the NEAT
+networks see.
+
+    env = FlappyVecEnv(1024)
+    obs = env.reset(range(1024))
+    while not env.done.all():
+        obs, reward, done, info = env.step(obs[:, 0] > 400)
+"""
+import numpy as np
+
+import engine
+
+BIRD_X, BIRD_Y = 230, 350
+PIPE_X = 700            #x at which every new pipe appears
+MAX_PIPES = 3           #pipes a world can hold at once
+
+
+class FlappyVecEnv:
+    """
+    N worlds with one bird each. A world is done once its bird has crashed and
+    stays frozen until it is reset. Observations are (bird y, next pipe x, next
+    pipe height, next pipe bottom), rewards follow the training fitness: the
+    centre bonus every frame, 5 for every pipe passed and -1 for hitting a pipe.
+    Without pixel_perfect the birds collide like engine.Pipe.collide_flock's
+    analytic test.
+    """
+    observation_size = 4
+
+    def __init__(self, num_envs, course_length=1024, warmup=0, pixel_perfect=True):
+        self.num_envs = num_envs
+        self.course_length = course_length
+        self.warmup = warmup
+        self.pixel_perfect = pixel_perfect
+
+        self.flock = engine.Flock(num_envs, BIRD_X, BIRD_Y)
+        self.flock.alive[:] = False
+        self.courses = np.zeros((num_envs, course_length), dtype=np.int16)
+        self.pipe_x = np.zeros((num_envs, MAX_PIPES), dtype=int)
+        self.pipe_height = np.zeros((num_envs, MAX_PIPES), dtype=int)
+        self.pipe_passed = np.zeros((num_envs, MAX_PIPES), dtype=bool)
+        self.num_pipes = np.zeros(num_envs, dtype=int)
+        self.score = np.zeros(num_envs, dtype=int)
+        self.frames = np.zeros(num_envs, dtype=int)
+        self._rows = np.arange(num_envs)
+
+    @property
+    def done(self):
+        return ~self.flock.alive
+
+    def reset(self, seeds, index=None):
+        """
+        Starts new games on the courses of seeds, in the worlds selected by index
+        (all of them by default), and returns the observations of every world.
+        """
+        index = self._rows if index is None else np.asarray(index)
+        seeds = list(seeds)
+        if len(seeds) != len(index):
+            raise ValueError("Expected {0} seeds, got {1}".format(len(index), len(seeds)))
+
+        for i, seed in zip(index, seeds):
+            self.courses[i] = engine.make_course(seed, self.course_length, self.warmup)
+
+        flock = self.flock
+        flock.y[index] = BIRD_Y
+        flock.height[index] = BIRD_Y
+        flock.vel[index] = 0
+        flock.tilt[index] = 0
+        flock.tick_count[index] = 0
+        flock.fitness[index] = 0
+        flock.alive[index] = True
+
+        self.pipe_x[index] = 0
+        self.pipe_height[index] = 0
+        self.pipe_passed[index] = False
+        self.pipe_x[index, 0] = PIPE_X
+        self.pipe_height[index, 0] = self.courses[index, 0]
+        self.num_pipes[index] = 1
+        self.score[index] = 0
+        self.frames[index] = 0
+
+        # the birds make the first move of their frame before anyone decides to jump
+        moving = np.zeros(self.num_envs, dtype=bool)
+        moving[index] = True
+        self._move(moving)
+        return self.observations()
+
+    def observations(self):
+        # same choice of the pipe ahead as the game loops
+        ahead = ((self.num_pipes > 1) &
+                 (self.pipe_x[:, 1] + engine.Pipe.WIDTH/2 < engine.WIN_WIDTH)).astype(int)
+        obs = np.empty((self.num_envs, self.observation_size))
+        obs[:, 0] = self.flock.y
+        obs[:, 1] = self.pipe_x[self._rows, ahead]
+        obs[:, 2] = self.pipe_height[self._rows, ahead]
+        obs[:, 3] = obs[:, 2] + engine.Pipe.GAP
+        return obs
+
+    def step(self, actions):
+        """
+        Jumps the birds whose action is truthy, plays the rest of the frame and
+        the move of the next one. Returns (observations, rewards, done, info).
+        """
+        flock = self.flock
+        live = flock.alive.copy()
+        reward = np.zeros(self.num_envs)
+        flock.jump(live & np.asarray(actions, dtype=bool))
+
+        crashed = self._collide(live)
+        reward[crashed] -= 1
+        flock.alive[crashed] = False
+        live &= ~crashed
+
+        # pipes that the bird has just passed add the next pipe of the course
+        active = np.arange(MAX_PIPES) < self.num_pipes[:, None]
+        passing = live[:, None] & active & ~self.pipe_passed & (self.pipe_x < BIRD_X)
+        self.pipe_passed |= passing
+        add_pipe = passing.any(axis=1)
+        leaving = live & (self.pipe_x[:, 0] + engine.Pipe.WIDTH < 0)
+        self.pipe_x[live] -= engine.Pipe.VEL * active[live]
+
+        adding = np.flatnonzero(add_pipe)
+        self.score[adding] += 1
+        reward[adding] += 5
+        slot = self.num_pipes[adding]
+        self.pipe_x[adding, slot] = PIPE_X
+        self.pipe_height[adding, slot] = self.courses[adding, self.score[adding] % self.course_length]
+        self.pipe_passed[adding, slot] = False
+        self.num_pipes[adding] += 1
+
+        for pipes in (self.pipe_x, self.pipe_height, self.pipe_passed):
+            pipes[leaving, :-1] = pipes[leaving, 1:]
+        self.num_pipes[leaving] -= 1
+
+        flock.alive[flock.out_of_bounds()] = False
+        self.frames[live] += 1
+
+        reward += self._move(flock.alive)
+        done = ~flock.alive
+        return self.observations(), reward, done, {'score': self.score.copy(), 'frames': self.frames.copy()}
+
+    def rollout(self, policy, steps):
+        """
+        Plays up to steps frames, asking policy(observations) for the actions of
+        every world each frame. Returns the total reward of every world.
+        """
+        obs = self.observations()
+        total = np.zeros(self.num_envs)
+        for _ in range(steps):
+            if self.done.all():
+                break
+            obs, reward, _, _ = self.step(policy(obs))
+            total += reward
+        return total
+
+    def _move(self, mask):
+        """ Moves the selected birds and returns the centre bonus each of them earned. """
+        flock = self.flock
+        y, vel, tilt = flock.y.copy(), flock.vel.copy(), flock.tilt.copy()
+        tick_count = flock.tick_count.copy()
+        flock.move()
+        # frozen worlds keep their bird where it was
+        flock.y[~mask], flock.vel[~mask], flock.tilt[~mask] = y[~mask], vel[~mask], tilt[~mask]
+        flock.tick_count[~mask] = tick_count[~mask]
+
+        center = engine.WIN_HEIGHT/2
+        bonus = np.where(mask, (center - np.abs(center - flock.y)) * 0.1, 0.0)
+        flock.fitness += bonus
+        return bonus
+
+    def _collide(self, live):
+        """ Mask of the live birds hitting any of their pipes, pixel perfect unless the env says otherwise. """
+        hits = np.zeros(self.num_envs, dtype=bool)
+        ys = np.round(self.flock.y).astype(int)
+        for k in range(MAX_PIPES):
+            dx = self.pipe_x[:, k] - BIRD_X
+            top = self.pipe_height[:, k]
+            bottom = top + engine.Pipe.GAP
+            candidates = (live & (k < self.num_pipes) & (-engine.Pipe.WIDTH < dx) & (dx < engine.Bird.WIDTH) &
+                          ((ys < top) | (ys + engine.Bird.HEIGHT > bottom)))
+            if not self.pixel_perfect:
+                hits |= candidates
+                continue
+
+            index = np.flatnonzero(candidates)
+            for offset in np.unique(dx[index]):
+                same = index[dx[index] == offset]
+                hits[same] |= engine.pipe_hits(offset, True, ys[same] - (top[same] - engine.Pipe.LENGTH))
+                hits[same] |= engine.pipe_hits(offset, False, ys[same] - bottom[same])
+        return hits
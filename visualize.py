@@ -1,6 +1,13 @@
 from __future__ import print_function
 
+import bisect
 import copy
+import json
+import multiprocessing
+import os
+import queue
+import time
+import traceback
 import warnings
 
 import graphviz
@@ -10,14 +17,20 @@ import numpy as np
 
 def plot_stats(statistics, ylog=False, view=False, filename='avg_fitness.svg'):
     """ Plots the population's average and best fitness. """
+    best_fitness = [c.fitness for c in statistics.most_fit_genomes]
+    plot_fitness(range(len(best_fitness)), best_fitness, statistics.get_fitness_mean(),
+                 statistics.get_fitness_stdev(), ylog, view, filename)
+
+
+def plot_fitness(generation, best_fitness, avg_fitness, stdev_fitness, ylog=False, view=False,
+                 filename='avg_fitness.svg'):
+    """ Plots the average and best fitness of every generation from plain sequences. """
     if plt is None:
         warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
         return
 
-    generation = range(len(statistics.most_fit_genomes))
-    best_fitness = [c.fitness for c in statistics.most_fit_genomes]
-    avg_fitness = np.array(statistics.get_fitness_mean())
-    stdev_fitness = np.array(statistics.get_fitness_stdev())
+    avg_fitness = np.array(avg_fitness)
+    stdev_fitness = np.array(stdev_fitness)
 
     plt.plot(generation, avg_fitness, 'b-', label="average")
     plt.plot(generation, avg_fitness - stdev_fitness, 'g-.', label="-1 sd")
@@ -90,16 +103,21 @@ def plot_spikes(spikes, view=False, filename=None, title=None):
 
 def plot_species(statistics, view=False, filename='speciation.svg'):
     """ Visualizes speciation throughout evolution. """
+    plot_species_sizes(statistics.get_species_sizes(), view, filename)
+
+
+def plot_species_sizes(species_sizes, view=False, filename='speciation.svg', generation=None):
+    """ Stacks the size of every species, species_sizes holds one list of sizes per generation. """
     if plt is None:
         warnings.warn("This display is not available due to a missing optional dependency (matplotlib)")
         return
 
-    species_sizes = statistics.get_species_sizes()
-    num_generations = len(species_sizes)
+    if generation is None:
+        generation = range(len(species_sizes))
     curves = np.array(species_sizes).T
 
     fig, ax = plt.subplots()
-    ax.stackplot(range(num_generations), *curves)
+    ax.stackplot(generation, *curves)
 
     plt.title("Speciation")
     plt.ylabel("Size per Species")
@@ -113,6 +131,106 @@ def plot_species(statistics, view=False, filename='speciation.svg'):
     plt.close()
 
 
+class Telemetry(object):
+    """
+    The series of a training run, read from the file a reporters.TelemetryReporter
+    writes. update() only reads the lines added since the last call, so the
+    plots can be refreshed while the run is still going. A generation that is
+    written again, after resuming from a checkpoint, replaces the later ones.
+    """
+
+    def __init__(self, filename='telemetry.jsonl'):
+        self.filename = filename
+        self.offset = 0
+        self.generation = []
+        self.best = []
+        self.mean = []
+        self.stdev = []
+        self.species = []
+
+    def update(self):
+        """ Reads the new whole lines of the file and returns how many there were. """
+        try:
+            with open(self.filename, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+
+        # a line still being written has no newline yet, it is read next time
+        lines = data.split(b'\n')[:-1]
+        for line in lines:
+            self.offset += len(line) + 1
+            self._add(json.loads(line))
+        return len(lines)
+
+    def _add(self, record):
+        while self.generation and self.generation[-1] >= record['generation']:
+            for series in (self.generation, self.best, self.mean, self.stdev, self.species):
+                series.pop()
+        self.generation.append(record['generation'])
+        self.best.append(record['best'])
+        self.mean.append(record['mean'])
+        self.stdev.append(record['stdev'])
+        self.species.append(dict((int(sid), size) for sid, size in record['species'].items()))
+
+    def species_sizes(self):
+        """ One list per generation with the size of every species ever seen, 0 when it didn't exist. """
+        keys = sorted(set(sid for sizes in self.species for sid in sizes))
+        return [[sizes.get(sid, 0) for sid in keys] for sizes in self.species]
+
+    def series(self, max_points=None, until=None):
+        """
+        The fitness series and the species sizes up to generation until,
+        downsampled to max_points generations.
+        """
+        length = len(self.generation) if until is None else bisect.bisect_right(self.generation, until)
+        index = downsample(length, max_points)
+        sizes = self.species_sizes()
+        return {
+            'generation': [self.generation[i] for i in index],
+            'best': [self.best[i] for i in index],
+            'mean': [self.mean[i] for i in index],
+            'stdev': [self.stdev[i] for i in index],
+            'species': [sizes[i] for i in index],
+        }
+
+    def plot(self, ylog=False, view=False, fitness_filename='avg_fitness.svg', species_filename='speciation.svg',
+             max_points=None):
+        if not self.generation:
+            return
+        series = self.series(max_points)
+        plot_fitness(series['generation'], series['best'], series['mean'], series['stdev'], ylog, view,
+                     fitness_filename)
+        plot_species_sizes(series['species'], view, species_filename, series['generation'])
+
+
+def downsample(length, max_points=None):
+    """
+    Indices of at most max_points evenly spread items out of length, always
+    keeping the first and the last one. All of them without max_points.
+    """
+    if max_points is None or length <= max_points:
+        return list(range(length))
+    return sorted(set(np.linspace(0, length - 1, max_points).round().astype(int).tolist()))
+
+
+def watch(filename='telemetry.jsonl', interval=10.0, max_points=500):
+    """
+    Redraws the plots of a running training whenever its telemetry file grows,
+    until interrupted, with at most max_points generations.
+    """
+    telemetry = Telemetry(filename)
+    try:
+        while True:
+            if telemetry.update():
+                telemetry.plot(max_points=max_points)
+                print("Plotted generation {0}".format(telemetry.generation[-1]))
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
 def draw_net(config, genome, view=False, filename=None, node_names=None, show_disabled=True, prune_unused=False,
              node_colors=None, fmt='svg'):
     """ Receives a genome and draws a neural network with arbitrary topology. """
@@ -186,4 +304,188 @@ def draw_net(config, genome, view=False, filename=None, node_names=None, show_di
 
     dot.render(filename, view=view)
 
-    return dot
\ No newline at end of file
+    return dot
+
+
+def layered_layout(config, genome):
+    """
+    Positions of the nodes of genome, the inputs in the first column, the
+    outputs in the last one and every other node in the column of its depth.
+    """
+    from neat.graphs import feed_forward_layers
+
+    input_keys = list(config.genome_config.input_keys)
+    output_keys = list(config.genome_config.output_keys)
+    connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+    columns = [input_keys]
+    for layer in feed_forward_layers(input_keys, output_keys, connections):
+        hidden = sorted(layer - set(output_keys))
+        if hidden:
+            columns.append(hidden)
+    placed = set(k for column in columns for k in column)
+    # nodes no output depends on get a column of their own before the outputs
+    unused = sorted(k for k in genome.nodes if k not in placed and k not in output_keys)
+    if unused:
+        columns.append(unused)
+    columns.append(output_keys)
+
+    positions = {}
+    for x, column in enumerate(columns):
+        for i, key in enumerate(column):
+            positions[key] = (float(x), (len(column) - 1) / 2.0 - i)
+    return positions
+
+
+class Layouts(object):
+    """
+    Node positions by network topology, so drawing a network whose nodes and
+    connections haven't changed since an earlier drawing skips the layout.
+    The oldest topology is forgotten once max_size of them are kept.
+    """
+
+    def __init__(self, config, max_size=256):
+        self.config = config
+        self.max_size = max_size
+        self.positions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, genome):
+        key = (tuple(sorted(genome.nodes)), tuple(sorted(k for k, cg in genome.connections.items() if cg.enabled)))
+        positions = self.positions.get(key)
+        if positions is None:
+            self.misses += 1
+            positions = layered_layout(self.config, genome)
+            if len(self.positions) >= self.max_size:
+                del self.positions[next(iter(self.positions))]
+            self.positions[key] = positions
+        else:
+            self.hits += 1
+        return positions
+
+
+def plot_net(genome, positions, filename, node_names=None, show_disabled=True):
+    """
+    Draws the network of genome at the given node positions with matplotlib,
+    coloured like draw_net: green and red connections for positive and
+    negative weights, dotted when disabled.
+    """
+    node_names = node_names or {}
+    fig, ax = plt.subplots(figsize=(6, 4))
+    for cg in genome.connections.values():
+        a, b = cg.key
+        if (not cg.enabled and not show_disabled) or a not in positions or b not in positions:
+            continue
+        (x0, y0), (x1, y1) = positions[a], positions[b]
+        ax.plot([x0, x1], [y0, y1], linestyle='-' if cg.enabled else ':', color='green' if cg.weight > 0 else 'red',
+                linewidth=0.1 + abs(cg.weight / 5.0), zorder=1)
+    for key, (x, y) in positions.items():
+        ax.scatter([x], [y], s=300, marker='s' if key < 0 else 'o', color='lightgray' if key < 0 else 'white',
+                   edgecolors='black', zorder=2)
+        ax.annotate(node_names.get(key, str(key)), (x, y), ha='center', va='center', fontsize=7, zorder=3)
+    ax.margins(0.15)
+    ax.axis('off')
+    fig.savefig(filename)
+    plt.close(fig)
+
+
+def net_record(genome, positions, node_names=None):
+    """ The network of genome as plain data, for a JSON report. """
+    node_names = node_names or {}
+    return {
+        'nodes': [{'key': key, 'name': node_names.get(key, str(key)), 'x': x, 'y': y}
+                  for key, (x, y) in positions.items()],
+        'connections': [{'input': cg.key[0], 'output': cg.key[1], 'weight': cg.weight, 'enabled': cg.enabled}
+                        for cg in genome.connections.values()],
+    }
+
+
+class ReportWorker(object):
+    """
+    Draws visual reports of a training run in a background process, so the
+    training never waits for matplotlib. submit() hands over the best genome of
+    a generation, and the worker writes into directory the network, the
+    fitness and the species plots read from the telemetry file, in every image
+    format of formats, plus a JSON file when formats has 'json'. At most
+    backlog reports wait at a time, the ones submitted beyond that are skipped.
+    A report that fails is printed and skipped, the worker goes on with the
+    next one.
+    """
+
+    def __init__(self, config, directory='reports', telemetry='telemetry.jsonl', formats=('png', 'json'),
+                 node_names=None, max_points=500, backlog=2):
+        os.makedirs(directory, exist_ok=True)
+        self.jobs = multiprocessing.Queue(backlog)
+        self.process = multiprocessing.Process(
+            target=_report_loop, args=(self.jobs, config, directory, telemetry, formats, node_names, max_points),
+            daemon=True)
+        self.process.start()
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def submit(self, generation, genome):
+        """ Queues a report, returns False when it was skipped. """
+        if not self.alive:
+            return False
+        try:
+            self.jobs.put_nowait((generation, genome))
+            return True
+        except queue.Full:
+            return False
+
+    def close(self, poll=1.0):
+        """ Waits for the queued reports to be written, unless the worker has stopped. """
+        # a full queue is only emptied by a live worker, so it's looked at every poll seconds
+        while self.alive:
+            try:
+                self.jobs.put(None, timeout=poll)
+                break
+            except queue.Full:
+                pass
+        self.process.join()
+        if self.process.exitcode:
+            # nothing reads the reports still queued, which must not hold up the exit
+            self.jobs.cancel_join_thread()
+            print("The report worker stopped with exit code {0}, later reports were skipped".format(
+                self.process.exitcode))
+
+
+def _report_loop(jobs, config, directory, telemetry, formats, node_names, max_points):
+    plt.switch_backend('Agg')
+    layouts = Layouts(config)
+    stats = Telemetry(telemetry)
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        generation, genome = job
+        try:
+            _report(generation, genome, layouts, stats, directory, formats, node_names, max_points)
+        except Exception:
+            print("Visual report of generation {0} failed:".format(generation))
+            traceback.print_exc()
+
+
+def _report(generation, genome, layouts, stats, directory, formats, node_names, max_points):
+    stats.update()
+    positions = layouts.get(genome)
+    # the worker may be behind the training, the file already has later generations
+    series = stats.series(max_points, generation)
+    name = os.path.join(directory, 'generation-{0}'.format(generation))
+
+    for fmt in formats:
+        if fmt == 'json':
+            continue
+        plot_net(genome, positions, '{0}-net.{1}'.format(name, fmt), node_names)
+        if series['generation']:
+            plot_fitness(series['generation'], series['best'], series['mean'], series['stdev'],
+                         filename='{0}-fitness.{1}'.format(name, fmt))
+            plot_species_sizes(series['species'], filename='{0}-species.{1}'.format(name, fmt),
+                               generation=series['generation'])
+    if 'json' in formats:
+        record = {'generation': generation, 'genome': genome.key, 'fitness': genome.fitness,
+                  'net': net_record(genome, positions, node_names), 'series': series}
+        with open(name + '.json', 'w') as f:
+            json.dump(record, f, separators=(',', ':'))